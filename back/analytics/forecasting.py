@@ -0,0 +1,162 @@
+"""
+Demand forecasting for restock recommendations.
+
+Daily sales are pivoted into a SKU x day demand matrix and every SKU is fitted at
+once with additive Holt-Winters (damped trend, weekly seasonality): each update
+step is a NumPy operation over the whole SKU axis, so the cost grows with the
+number of days, not with the number of SKUs.
+"""
+from datetime import datetime, time, timedelta, timezone
+from itertools import chain
+import numpy as np
+from core.cache import cache, cache_key, MISS
+from core.config import settings
+from db import queries
+from db.read_routing import aggregate
+from models.sales_transaction import SalesTransaction
+
+SEASON_LENGTH = 7
+
+# Smoothing factors: level, trend, seasonality and trend damping
+ALPHA = 0.4
+BETA = 0.1
+GAMMA = 0.2
+PHI = 0.9
+
+
+def build_demand_matrix(rows: list[dict], n_days: int) -> tuple[list[str], np.ndarray]:
+    """
+    Pivot the per-SKU rows of daily_sales_pipeline into a dense SKU x day matrix of
+    `n_days` days. The index arrays are filled with np.fromiter (no Python loop per sale);
+    day offsets outside the matrix are dropped.
+    """
+    skus = [row["_id"] for row in rows]
+    counts = np.fromiter((len(row["days"]) for row in rows), dtype=np.int64, count=len(rows))
+    total = int(counts.sum())
+    sku_index = np.repeat(np.arange(len(rows)), counts)
+    day_index = np.fromiter(chain.from_iterable(row["days"] for row in rows), dtype=np.int64, count=total)
+    quantities = np.fromiter(chain.from_iterable(row["quantities"] for row in rows), dtype=np.float64, count=total)
+
+    in_range = (day_index >= 0) & (day_index < n_days)
+    demand = np.zeros((len(skus), n_days), dtype=np.float64)
+    # (SKU, day) pairs are unique: the pipeline groups by both
+    demand[sku_index[in_range], day_index[in_range]] = quantities[in_range]
+    return skus, demand
+
+
+def holt_winters_forecast(demand: np.ndarray, horizon: int) -> np.ndarray:
+    """
+    Forecast the next `horizon` days of demand for every row of a SKU x day matrix.
+
+    The trend is damped so that trending SKUs (sudden sustained surges) lift the
+    level quickly without extrapolating the surge forever.
+    """
+    n_skus, n_days = demand.shape
+    if n_days == 0:
+        return np.zeros((n_skus, horizon))
+
+    if n_days >= 2 * SEASON_LENGTH:
+        first_week = demand[:, :SEASON_LENGTH]
+        second_week = demand[:, SEASON_LENGTH:2 * SEASON_LENGTH]
+        level = first_week.mean(axis=1)
+        trend = (second_week.mean(axis=1) - level) / SEASON_LENGTH
+        seasonal = first_week - level[:, None]
+    else:
+        # Not enough history for seasonality: plain damped-trend smoothing
+        level = demand.mean(axis=1)
+        trend = np.zeros(n_skus)
+        seasonal = np.zeros((n_skus, SEASON_LENGTH))
+
+    for t in range(n_days):
+        season_slot = t % SEASON_LENGTH
+        observed = demand[:, t]
+        previous_level = level
+        level = ALPHA * (observed - seasonal[:, season_slot]) + (1 - ALPHA) * (level + PHI * trend)
+        trend = BETA * (level - previous_level) + (1 - BETA) * PHI * trend
+        seasonal[:, season_slot] = GAMMA * (observed - level) + (1 - GAMMA) * seasonal[:, season_slot]
+
+    steps = np.arange(1, horizon + 1)
+    damped_steps = np.cumsum(PHI ** steps)
+    season_slots = (n_days + steps - 1) % SEASON_LENGTH
+    forecast = level[:, None] + trend[:, None] * damped_steps[None, :] + seasonal[:, season_slots]
+    return np.clip(forecast, 0, None)
+
+
+def history_window(history_days: int) -> tuple[datetime, datetime]:
+    """
+    UTC midnights `history_days` days before today (day 0 of the demand matrix) and
+    after today (end of the day axis, excluded). Sale timestamps are stored in UTC.
+    """
+    today = datetime.now(timezone.utc).date()
+    since = datetime.combine(today - timedelta(days=history_days), time.min, tzinfo=timezone.utc)
+    until = datetime.combine(today + timedelta(days=1), time.min, tzinfo=timezone.utc)
+    return since, until
+
+
+async def load_daily_sales(store_id: str, since: datetime, until: datetime):
+    """Daily sold quantities per SKU of a store, aggregated by MongoDB."""
+    return await aggregate(SalesTransaction, queries.daily_sales_pipeline(store_id, since, until), group="analytics")
+
+
+async def forecast_daily_demand(store_id: str, horizon: int) -> dict[str, np.ndarray]:
+    """
+    Forecast daily demand per SKU over `horizon` days.
+
+    Results are cached in the "forecast" namespace, which is invalidated whenever a
+    sale is created, updated or deleted.
+    """
+    key = cache_key(store_id=store_id, horizon=horizon)
+    cached = cache.get("forecast", key)
+    if cached is not MISS:
+        return cached
+
+    since, until = history_window(settings.FORECAST_HISTORY_DAYS)
+    rows = await load_daily_sales(store_id, since, until)
+    if not rows:
+        return {}
+
+    # The day axis ends today, so the days without sales since the last sale count as zero demand
+    skus, demand = build_demand_matrix(rows, (until - since).days)
+    # and starts at the first day with a sale of the store
+    first_day = int(np.argmax(demand.any(axis=0)))
+    forecast = holt_winters_forecast(demand[:, first_day:], horizon)
+    result = dict(zip(skus, forecast))
+
+    cache.set("forecast", key, result, ttl=settings.FORECAST_CACHE_SECONDS)
+    return result
+
+
+def restock_recommendations(stocks: list[dict], forecasts: dict[str, np.ndarray], days: int) -> list[dict]:
+    """
+    Products whose stock will not cover the next `days` days plus the safety stock,
+    with the quantity needed to cover RESTOCK_COVER_DAYS.
+    """
+    if not stocks:
+        return []
+
+    cover_days = max(settings.RESTOCK_COVER_DAYS, days)
+    horizon = cover_days + settings.SAFETY_STOCK_DAYS
+    empty_forecast = np.zeros(horizon)
+    current_stock = np.array([stock.get("virtual_stock", stock["stock_on_hand"]) for stock in stocks], dtype=np.float64)
+    daily_demand = np.stack([forecasts.get(stock["sku"], empty_forecast)[:horizon] for stock in stocks])
+
+    cumulative_demand = np.cumsum(daily_demand, axis=1)
+    average_daily_sales = daily_demand.mean(axis=1)
+    # Days until the cumulative forecast demand exceeds the stock (inf when it never does)
+    runs_out = cumulative_demand > current_stock[:, None]
+    days_until_out = np.where(runs_out.any(axis=1), runs_out.argmax(axis=1), np.inf)
+    at_risk = days_until_out <= days + settings.SAFETY_STOCK_DAYS
+    recommended = np.ceil(np.maximum(cumulative_demand[:, -1] - current_stock, 0))
+
+    result = [
+        {
+            "sku": stock["sku"],
+            "current_stock": int(current_stock[i]),
+            "average_daily_sales": round(float(average_daily_sales[i]), 2),
+            "days_until_out_of_stock": float(days_until_out[i]),
+            "recommended_order_quantity": int(recommended[i]),
+        }
+        for i, stock in enumerate(stocks)
+        if at_risk[i] and recommended[i] > 0
+    ]
+    return sorted(result, key=lambda x: x["days_until_out_of_stock"])
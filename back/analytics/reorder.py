@@ -0,0 +1,139 @@
+"""
+Per-SKU reorder state, maintained incrementally.
+
+Every write on sales, stock levels, orders or the supplier mapping refreshes the
+reorder_state documents of the SKUs it touches with a few indexed queries, so
+"what needs restocking" is an indexed query on the at-risk flag instead of a
+recompute over all stock and sales.
+"""
+import asyncio
+import math
+from datetime import datetime, timedelta, timezone
+from pymongo import UpdateOne
+from core.config import settings
+from core.load_shedding import check_deadline, command_options, query_options
+from db import queries
+from models.product_order import ProductOrder
+from models.reorder_state import ReorderState
+from models.sales_transaction import SalesTransaction
+from models.sku_supplier import SkuSupplier
+from models.stock_level import StockLevel
+
+
+def compute_reorder_state(stock_on_hand: int, pending_quantity: int, sold_quantity: int, lead_time_days: int) -> dict:
+    """
+    Reorder point = daily velocity x (supplier lead time + safety stock days).
+
+    A SKU is at risk when its virtual stock (stock on hand + pending orders) is at or
+    below its reorder point, i.e. it would run out before a new order is delivered.
+    """
+    daily_velocity = sold_quantity / settings.REORDER_VELOCITY_DAYS
+    virtual_stock = stock_on_hand + pending_quantity
+    reorder_point = math.ceil(daily_velocity * (lead_time_days + settings.SAFETY_STOCK_DAYS))
+    return {
+        "stock_on_hand": stock_on_hand,
+        "pending_quantity": pending_quantity,
+        "virtual_stock": virtual_stock,
+        "daily_velocity": round(daily_velocity, 3),
+        "lead_time_days": lead_time_days,
+        "reorder_point": reorder_point,
+        "days_of_cover": round(virtual_stock / daily_velocity, 1) if daily_velocity else None,
+        "at_risk": daily_velocity > 0 and virtual_stock <= reorder_point,
+        "updated_at": datetime.now(timezone.utc),
+    }
+
+
+class ReorderIndex:
+    """Keeps the reorder_state collection in sync with stock, sales, orders and suppliers."""
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+
+    async def refresh(self, store_id: str, *skus: str):
+        """
+        Recompute the reorder state of some SKUs of a store after a write.
+
+        Errors are logged and do not fail the write: the periodic rebuild repairs the state.
+        """
+        try:
+            await self._recompute(store_id, list(set(skus)))
+        except Exception as e:
+            print(f"[Reorder] Error refreshing {store_id} {', '.join(skus)}: {e}")
+
+    async def refresh_sku(self, sku: str):
+        """Recompute a SKU in every store stocking it (supplier lead time change)."""
+        stores = await StockLevel.get_pymongo_collection().distinct("store_id", {"sku": sku}, **command_options())
+        for store_id in stores:
+            await self.refresh(store_id, sku)
+
+    async def rebuild(self, store_id: str) -> int:
+        """Recompute every SKU of a store, returns the number of states written."""
+        return await self._recompute(store_id, None)
+
+    async def rebuild_all(self):
+        stores = await StockLevel.get_pymongo_collection().distinct("store_id")
+        for store_id in stores:
+            count = await self.rebuild(store_id)
+            print(f"[Reorder] {store_id}: {count} reorder states rebuilt")
+
+    async def _recompute(self, store_id: str, skus: list[str] | None) -> int:
+        """Reads are bounded by the request deadline when refreshing after a write, and writes are not started past it."""
+        since = datetime.now() - timedelta(days=settings.REORDER_VELOCITY_DAYS)
+        stock_query = {"store_id": store_id, **({"sku": {"$in": skus}} if skus else {})}
+        supplier_query = {"sku": {"$in": skus}} if skus else {}
+
+        stocks, pending, sold, suppliers = await asyncio.gather(
+            StockLevel.get_pymongo_collection().find(stock_query, **query_options()).to_list(None),
+            ProductOrder.get_pymongo_collection().aggregate(queries.pending_quantity_by_sku_pipeline(store_id, skus), **command_options()).to_list(None),
+            SalesTransaction.get_pymongo_collection().aggregate(queries.sold_quantity_by_sku_pipeline(store_id, since, skus), **command_options()).to_list(None),
+            SkuSupplier.get_pymongo_collection().find(supplier_query, **query_options()).to_list(None),
+        )
+        pending_quantities = {row["_id"]: row["quantity"] for row in pending}
+        sold_quantities = {row["_id"]: row["quantity"] for row in sold}
+        lead_times = {row["sku"]: row["po_lead_days"] for row in suppliers}
+
+        collection = ReorderState.get_pymongo_collection()
+        updates = [
+            UpdateOne(
+                {"store_id": store_id, "sku": stock["sku"]},
+                {"$set": compute_reorder_state(
+                    stock["stock_on_hand"],
+                    pending_quantities.get(stock["sku"], 0),
+                    sold_quantities.get(stock["sku"], 0),
+                    lead_times.get(stock["sku"], settings.DEFAULT_LEAD_DAYS),
+                )},
+                upsert=True
+            )
+            for stock in stocks
+        ]
+        check_deadline()
+        if updates:
+            await collection.bulk_write(updates, ordered=False)
+
+        # SKUs without a stock level in this store (deleted) have no reorder state
+        stocked = [stock["sku"] for stock in stocks]
+        stale_query = {"store_id": store_id, "sku": {"$nin": stocked}}
+        if skus:
+            stale_query["sku"]["$in"] = skus
+        await collection.delete_many(stale_query)
+        return len(updates)
+
+    async def start(self):
+        if settings.REORDER_REBUILD_INTERVAL_SECONDS > 0:
+            self._task = asyncio.create_task(self._rebuild_periodically())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _rebuild_periodically(self):
+        while True:
+            try:
+                await self.rebuild_all()
+            except Exception as e:
+                print(f"[Reorder] Rebuild error: {e}")
+            await asyncio.sleep(settings.REORDER_REBUILD_INTERVAL_SECONDS)
+
+
+reorder_index = ReorderIndex()
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, status
 from models.agent_history import AgentHistory
+from core.load_shedding import check_deadline, query_options
 from typing import List
 from datetime import datetime
 
@@ -9,24 +10,36 @@ router = APIRouter()
 @router.post("", response_model=AgentHistory, status_code=status.HTTP_201_CREATED)
 async def create_agent_history(agent_history: AgentHistory):
     """Create a new agent history entry."""
+    check_deadline()
     await agent_history.insert()
     return agent_history
 
 
+@router.post("/bulk", status_code=status.HTTP_201_CREATED)
+async def create_agent_history_bulk(entries: List[AgentHistory]):
+    """Create several agent history entries at once (batched writes of the LLM service)."""
+    if entries:
+        check_deadline()
+        await AgentHistory.insert_many(entries)
+    return {"inserted": len(entries)}
+
+
 @router.get("", response_model=List[AgentHistory])
-async def list_agent_history(type: str | None = None, limit: int = 100):
-    """List all agent history entries, optionally filtered by type."""
+async def list_agent_history(type: str | None = None, run_id: str | None = None, limit: int = 100):
+    """List all agent history entries, optionally filtered by type or agent run."""
+    query = {}
     if type:
-        history = await AgentHistory.find(AgentHistory.type == type).sort(-AgentHistory.timestamp).limit(limit).to_list()
-    else:
-        history = await AgentHistory.find_all().sort(-AgentHistory.timestamp).limit(limit).to_list()
+        query["type"] = type
+    if run_id:
+        query["run_id"] = run_id
+    history = await AgentHistory.find(query, **query_options()).sort(-AgentHistory.timestamp).limit(limit).to_list()
     return history
 
 
 @router.get("/{history_id}", response_model=AgentHistory)
 async def get_agent_history(history_id: str):
     """Get an agent history entry by ID."""
-    history = await AgentHistory.get(history_id)
+    history = await AgentHistory.get(history_id, **query_options())
     if not history:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -38,11 +51,12 @@ async def get_agent_history(history_id: str):
 @router.delete("/{history_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_agent_history(history_id: str):
     """Delete an agent history entry."""
-    history = await AgentHistory.get(history_id)
+    history = await AgentHistory.get(history_id, **query_options())
     if not history:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Agent history with ID {history_id} not found"
         )
 
+    check_deadline()
     await history.delete()
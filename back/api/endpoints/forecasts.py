@@ -0,0 +1,34 @@
+from fastapi import APIRouter, HTTPException, status
+from typing import List
+from pydantic import BaseModel
+from api.endpoints.stock_levels import get_all_virtual_stock
+from core.config import settings
+
+router = APIRouter()
+
+
+class RestockRecommendation(BaseModel):
+    sku: str
+    current_stock: int
+    average_daily_sales: float
+    days_until_out_of_stock: float
+    recommended_order_quantity: int
+
+
+@router.get("/restock", response_model=List[RestockRecommendation])
+async def get_restock_recommendations(days: int = 5, store_id: str = settings.DEFAULT_STORE_ID):
+    """Products that will run out of stock within `days` days, based on the demand forecast."""
+    if days < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="days must be at least 1"
+        )
+
+    # Imported on first use: NumPy is not loaded at startup
+    from analytics.forecasting import forecast_daily_demand, restock_recommendations
+
+    stocks = await get_all_virtual_stock(store_id=store_id)
+    horizon = max(settings.RESTOCK_COVER_DAYS, days) + settings.SAFETY_STOCK_DAYS
+    forecasts = await forecast_daily_demand(store_id, horizon)
+
+    return restock_recommendations([stock.model_dump() for stock in stocks], forecasts, days)
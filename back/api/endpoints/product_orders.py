@@ -1,7 +1,15 @@
 from fastapi import APIRouter, HTTPException, status
+from models.product import Product
 from models.product_order import ProductOrder
+from db import queries
+from db.invalidation_bus import invalidation_bus
+from analytics.reorder import reorder_index
+from core.config import settings
+from core.load_shedding import check_deadline, query_options
+from beanie.operators import In
 from typing import List
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from pymongo.errors import BulkWriteError
 
 router = APIRouter()
 
@@ -11,9 +19,21 @@ class ProductOrderUpdate(BaseModel):
     quantity: int | None = None
     status: str | None = None
 
+
+class BulkOrderItem(BaseModel):
+    sku: str
+    quantity: int = Field(..., ge=1)
+
+
+class BulkOrderRequest(BaseModel):
+    items: List[BulkOrderItem]
+
 @router.post("", response_model=ProductOrder, status_code=status.HTTP_201_CREATED)
-async def create_product_order(order: ProductOrder):
+async def create_product_order(order: ProductOrder, store_id: str | None = None):
     """Create a new product order."""
+    if store_id:
+        order.store_id = store_id
+
     # Validate SKU is not empty
     if not order.sku or not order.sku.strip():
         raise HTTPException(
@@ -22,62 +42,120 @@ async def create_product_order(order: ProductOrder):
         )
 
     # Validate product exists
-    from models.product import Product
-    product = await Product.find_one(Product.sku == order.sku.strip())
+    product = await Product.find_one(Product.sku == order.sku.strip(), **query_options())
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Product with SKU {order.sku} not found"
         )
 
+    check_deadline()
     await order.insert()
+    # Pending orders are part of the virtual stock
+    await invalidation_bus.publish("stocks")
+    await reorder_index.refresh(order.store_id, order.sku)
     return order
 
+@router.post("/bulk", response_model=List[ProductOrder], status_code=status.HTTP_201_CREATED)
+async def create_product_orders_bulk(request: BulkOrderRequest, store_id: str | None = None):
+    """
+    Create several product orders at once. Every SKU is validated before anything is
+    written, but the insert is not transactional: if it fails partway, the response
+    lists the orders already inserted.
+    """
+    if not request.items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one item is required"
+        )
+
+    skus = {item.sku.strip() for item in request.items}
+    if "" in skus:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="SKU cannot be empty"
+        )
+
+    # Validate every product in one query
+    products = await Product.find(In(Product.sku, list(skus)), **query_options()).to_list()
+    missing = skus - {product.sku for product in products}
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Products with SKU {', '.join(sorted(missing))} not found"
+        )
+
+    orders = [
+        ProductOrder(
+            sku=item.sku.strip(),
+            quantity=item.quantity,
+            store_id=store_id or settings.DEFAULT_STORE_ID
+        )
+        for item in request.items
+    ]
+    check_deadline()
+    try:
+        result = await ProductOrder.insert_many(orders)
+    except BulkWriteError as e:
+        # Ordered insert: the first nInserted orders were written
+        inserted = orders[:e.details.get("nInserted", 0)]
+        if inserted:
+            await invalidation_bus.publish("stocks")
+            await reorder_index.refresh(store_id or settings.DEFAULT_STORE_ID, *{order.sku for order in inserted})
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "message": f"Bulk order failed after {len(inserted)} of {len(orders)} orders",
+                "inserted_order_ids": [order.order_id for order in inserted],
+            }
+        )
+    for order, inserted_id in zip(orders, result.inserted_ids):
+        order.id = inserted_id
+    await invalidation_bus.publish("stocks")
+    await reorder_index.refresh(store_id or settings.DEFAULT_STORE_ID, *skus)
+    return orders
+
 @router.get("", response_model=List[ProductOrder])
-async def list_product_orders(limit: int = 100, status: str | None = None, days: int | None = None):
-    """List all product orders."""
-    # Build query conditions
-    if status and days is not None:
-        from datetime import datetime, timedelta
-        cutoff_date = datetime.now() - timedelta(days=days)
-        orders = await ProductOrder.find(
-            ProductOrder.status == status,
-            ProductOrder.order_date >= cutoff_date
-        ).limit(limit).to_list()
-    elif status:
-        orders = await ProductOrder.find(ProductOrder.status == status).limit(limit).to_list()
-    elif days is not None:
-        from datetime import datetime, timedelta
-        cutoff_date = datetime.now() - timedelta(days=days)
-        orders = await ProductOrder.find(ProductOrder.order_date < cutoff_date).limit(limit).to_list()
-    else:
-        orders = await ProductOrder.find_all().limit(limit).to_list()
+async def list_product_orders(
+    limit: int = 100,
+    status: str | None = None,
+    days: int | None = None,
+    store_id: str = settings.DEFAULT_STORE_ID
+):
+    """List all product orders of a store."""
+    query = queries.orders_filter(store_id, status=status, days=days)
+    orders = await ProductOrder.find(query, **query_options()).limit(limit).to_list()
     return orders
 
-@router.get("/{order_id}", response_model=ProductOrder)
-async def get_product_order(order_id: str):
-    """Get a product order by ID."""
-    order = await ProductOrder.find_one(ProductOrder.order_id == order_id)
+async def find_order(order_id: str, store_id: str | None) -> ProductOrder:
+    """Find an order, in `store_id` only when given (404 when it belongs to another store)."""
+    conditions = [ProductOrder.order_id == order_id]
+    if store_id:
+        conditions.append(ProductOrder.store_id == store_id)
+    order = await ProductOrder.find_one(*conditions, **query_options())
     if not order:
+        print(f"[Orders] Order {order_id} not found" + (f" in store {store_id}" if store_id else ""))
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Order {order_id} not found"
+            detail=f"Order {order_id} not found" + (f" in store {store_id}" if store_id else "")
         )
     return order
 
+@router.get("/{order_id}", response_model=ProductOrder)
+async def get_product_order(order_id: str, store_id: str | None = None):
+    """Get a product order by ID."""
+    order = await find_order(order_id, store_id)
+    return order
+
 @router.put("/{order_id}", response_model=ProductOrder)
 async def update_product_order(
     order_id: str,
-    update_data: ProductOrderUpdate
+    update_data: ProductOrderUpdate,
+    store_id: str | None = None
 ):
     """Update a product order."""
-    order = await ProductOrder.find_one(ProductOrder.order_id == order_id)
-    if not order:
-        print(f"[Orders] Order {order_id} not found for update")
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Order {order_id} not found"
-        )
+    order = await find_order(order_id, store_id)
+    previous_sku = order.sku
 
     if update_data.sku is not None:
         order.sku = update_data.sku
@@ -86,21 +164,28 @@ async def update_product_order(
     if update_data.status is not None:
         if order.status == "pending" and update_data.status == "completed":
             from models.stock_level import StockLevel
-            stock = await StockLevel.find_one(StockLevel.sku == order.sku)
+            stock = await StockLevel.find_one(StockLevel.store_id == order.store_id, StockLevel.sku == order.sku, **query_options())
+            if not stock:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Stock level for SKU {order.sku} not found in store {order.store_id}"
+                )
             stock.stock_on_hand += order.quantity
+            check_deadline()
             await stock.save()
         order.status = update_data.status
 
+    check_deadline()
     await order.save()
+    await invalidation_bus.publish("stocks")
+    await reorder_index.refresh(order.store_id, previous_sku, order.sku)
     return order
 
 @router.delete("/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_product_order(order_id: str):
+async def delete_product_order(order_id: str, store_id: str | None = None):
     """Delete a product order."""
-    order = await ProductOrder.find_one(ProductOrder.order_id == order_id)
-    if not order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Order {order_id} not found"
-        )
-    await order.delete()
\ No newline at end of file
+    order = await find_order(order_id, store_id)
+    check_deadline()
+    await order.delete()
+    await invalidation_bus.publish("stocks")
+    await reorder_index.refresh(order.store_id, order.sku)
@@ -1,5 +1,9 @@
 from fastapi import APIRouter, HTTPException, status
 from models.product import Product
+from core.cache import cache, cache_key, MISS
+from db import queries
+from db.invalidation_bus import invalidation_bus
+from core.load_shedding import check_deadline, query_options
 from typing import List
 from pydantic import BaseModel
 
@@ -15,14 +19,16 @@ class ProductUpdate(BaseModel):
 @router.post("", response_model=Product, status_code=status.HTTP_201_CREATED)
 async def create_product(product: Product):
     """Create a new product."""
-    existing = await Product.find_one(Product.sku == product.sku)
+    existing = await Product.find_one(Product.sku == product.sku, **query_options())
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Product with SKU {product.sku} already exists"
         )
 
+    check_deadline()
     await product.insert()
+    await invalidation_bus.publish("products")
     return product
 
 
@@ -36,43 +42,38 @@ async def list_products(
     limit: int = 100
 ):
     """List all products with optional filters."""
-    conditions = []
-
-    if category:
-        conditions.append(Product.category == category)
-    if sku:
-        conditions.append(Product.sku == sku)
-    if name:
-        # Case-insensitive partial match
-        conditions.append(Product.name.contains(name, case_sensitive=False))
-    if min_price is not None:
-        conditions.append(Product.price >= min_price)
-    if max_price is not None:
-        conditions.append(Product.price <= max_price)
-
-    if conditions:
-        products = await Product.find(*conditions).limit(limit).to_list()
-    else:
-        products = await Product.find_all().limit(limit).to_list()
+    key = cache_key(category=category, sku=sku, name=name, min_price=min_price, max_price=max_price, limit=limit)
+    cached = cache.get("products", key)
+    if cached is not MISS:
+        return cached
+
+    query = queries.products_filter(category=category, sku=sku, name=name, min_price=min_price, max_price=max_price)
+    products = await Product.find(query, **query_options()).limit(limit).to_list()
+    cache.set("products", key, products)
     return products
 
 
 @router.get("/{sku}", response_model=Product)
 async def get_product(sku: str):
     """Get a product by SKU."""
-    product = await Product.find_one(Product.sku == sku)
+    product = cache.get("products", sku)
+    if product is not MISS:
+        return product
+
+    product = await Product.find_one(Product.sku == sku, **query_options())
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Product with SKU {sku} not found"
         )
+    cache.set("products", sku, product)
     return product
 
 
 @router.put("/{sku}", response_model=Product)
 async def update_product(sku: str, update_data: ProductUpdate):
     """Update a product."""
-    product = await Product.find_one(Product.sku == sku)
+    product = await Product.find_one(Product.sku == sku, **query_options())
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -86,18 +87,22 @@ async def update_product(sku: str, update_data: ProductUpdate):
     if update_data.price is not None:
         product.price = update_data.price
 
+    check_deadline()
     await product.save()
+    await invalidation_bus.publish("products")
     return product
 
 
 @router.delete("/{sku}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_product(sku: str):
     """Delete a product."""
-    product = await Product.find_one(Product.sku == sku)
+    product = await Product.find_one(Product.sku == sku, **query_options())
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Product with SKU {sku} not found"
         )
 
-    await product.delete()
\ No newline at end of file
+    check_deadline()
+    await product.delete()
+    await invalidation_bus.publish("products")
@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+from typing import List
+from analytics.reorder import reorder_index
+from core.config import settings
+from db import queries
+from models.reorder_state import ReorderState
+from core.load_shedding import query_options
+
+router = APIRouter()
+
+
+@router.get("/at-risk", response_model=List[ReorderState])
+async def list_at_risk(limit: int = 100, store_id: str = settings.DEFAULT_STORE_ID):
+    """SKUs at or below their reorder point, most urgent (fewest days of cover) first."""
+    states = await ReorderState.find(queries.at_risk_filter(store_id), **query_options()).sort(queries.AT_RISK_SORT).limit(limit).to_list()
+    return states
+
+
+@router.get("", response_model=List[ReorderState])
+async def list_reorder_states(sku: str | None = None, limit: int = 100, store_id: str = settings.DEFAULT_STORE_ID):
+    """Reorder state of the SKUs of a store."""
+    query = {"store_id": store_id, **({"sku": sku} if sku else {})}
+    states = await ReorderState.find(query, **query_options()).limit(limit).to_list()
+    return states
+
+
+@router.post("/rebuild")
+async def rebuild_reorder_states(store_id: str = settings.DEFAULT_STORE_ID):
+    """Recompute the reorder state of every SKU of a store."""
+    count = await reorder_index.rebuild(store_id)
+    return {"store_id": store_id, "rebuilt": count}
@@ -2,8 +2,14 @@ from fastapi import APIRouter, HTTPException, status
 from models.sales_transaction import SalesTransaction
 from models.product import Product
 from models.stock_level import StockLevel
+from core.config import settings
+from db import queries
+from db.read_routing import read_many
+from db.invalidation_bus import invalidation_bus
+from analytics.reorder import reorder_index
+from core.load_shedding import check_deadline, query_options
 from typing import List
-from datetime import datetime, timedelta
+from datetime import datetime
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -16,10 +22,13 @@ class SalesTransactionUpdate(BaseModel):
 
 
 @router.post("", response_model=SalesTransaction, status_code=status.HTTP_201_CREATED)
-async def create_sale(sale: SalesTransaction):
+async def create_sale(sale: SalesTransaction, store_id: str | None = None):
     """Create a new sales transaction."""
+    if store_id:
+        sale.store_id = store_id
+
     try:
-        product = await Product.find_one(Product.sku == sale.sku)
+        product = await Product.find_one(Product.sku == sale.sku, **query_options())
         if not product:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -27,11 +36,11 @@ async def create_sale(sale: SalesTransaction):
             )
 
         # Check stock availability
-        stock = await StockLevel.find_one(StockLevel.sku == sale.sku)
+        stock = await StockLevel.find_one(StockLevel.store_id == sale.store_id, StockLevel.sku == sale.sku, **query_options())
         if not stock:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Stock level not found for SKU {sale.sku}"
+                detail=f"Stock level not found for SKU {sale.sku} in store {sale.store_id}"
             )
 
         if stock.stock_on_hand < sale.quantity:
@@ -41,7 +50,10 @@ async def create_sale(sale: SalesTransaction):
             )
 
 
+        check_deadline()
         await sale.insert()
+        await invalidation_bus.publish("forecast")
+        await reorder_index.refresh(sale.store_id, sale.sku)
         return sale
     except HTTPException:
         raise
@@ -60,57 +72,55 @@ async def list_sales(
     min_quantity: int | None = None,
     start_date: datetime | None = None,
     end_date: datetime | None = None,
-    limit: int = 100
+    limit: int = 100,
+    store_id: str = settings.DEFAULT_STORE_ID
 ):
-    """List all sales transactions with optional filters."""
-    conditions = []
-
-    if days is not None:
-        cutoff_date = datetime.now() - timedelta(days=days)
-        conditions.append(SalesTransaction.timestamp >= cutoff_date)
-    if sku:
-        conditions.append(SalesTransaction.sku == sku)
-    if min_quantity is not None:
-        conditions.append(SalesTransaction.quantity >= min_quantity)
-    if start_date:
-        conditions.append(SalesTransaction.timestamp >= start_date)
-    if end_date:
-        conditions.append(SalesTransaction.timestamp <= end_date)
-
-    if conditions:
-        sales = await SalesTransaction.find(*conditions).limit(limit).to_list()
-    else:
-        sales = await SalesTransaction.find_all().limit(limit).to_list()
+    """List all sales transactions of a store with optional filters."""
+    query = queries.sales_filter(
+        store_id,
+        days=days,
+        sku=sku,
+        min_quantity=min_quantity,
+        start_date=start_date,
+        end_date=end_date
+    )
+    sales = await read_many(SalesTransaction, query, group="analytics", limit=limit)
     return sales
 
 
-@router.get("/{transaction_id}", response_model=SalesTransaction)
-async def get_sale(transaction_id: str):
-    """Get a sales transaction by ID."""
-    sale = await SalesTransaction.find_one(SalesTransaction.transaction_id == transaction_id)
+async def find_sale(transaction_id: str, store_id: str | None) -> SalesTransaction:
+    """Find a transaction, in `store_id` only when given (404 when it belongs to another store)."""
+    conditions = [SalesTransaction.transaction_id == transaction_id]
+    if store_id:
+        conditions.append(SalesTransaction.store_id == store_id)
+    sale = await SalesTransaction.find_one(*conditions, **query_options())
     if not sale:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Transaction {transaction_id} not found"
+            detail=f"Transaction {transaction_id} not found" + (f" in store {store_id}" if store_id else "")
         )
     return sale
 
 
+@router.get("/{transaction_id}", response_model=SalesTransaction)
+async def get_sale(transaction_id: str, store_id: str | None = None):
+    """Get a sales transaction by ID."""
+    sale = await find_sale(transaction_id, store_id)
+    return sale
+
+
 @router.put("/{transaction_id}", response_model=SalesTransaction)
 async def update_sale(
     transaction_id: str,
-    update_data: SalesTransactionUpdate
+    update_data: SalesTransactionUpdate,
+    store_id: str | None = None
 ):
     """Update a sales transaction."""
-    sale = await SalesTransaction.find_one(SalesTransaction.transaction_id == transaction_id)
-    if not sale:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Transaction {transaction_id} not found"
-        )
+    sale = await find_sale(transaction_id, store_id)
+    previous_sku = sale.sku
 
     if update_data.sku is not None:
-        product = await Product.find_one(Product.sku == update_data.sku)
+        product = await Product.find_one(Product.sku == update_data.sku, **query_options())
         if not product:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -129,18 +139,19 @@ async def update_sale(
     if update_data.timestamp is not None:
         sale.timestamp = update_data.timestamp
 
+    check_deadline()
     await sale.save()
+    await invalidation_bus.publish("forecast")
+    await reorder_index.refresh(sale.store_id, previous_sku, sale.sku)
     return sale
 
 
 @router.delete("/{transaction_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_sale(transaction_id: str):
+async def delete_sale(transaction_id: str, store_id: str | None = None):
     """Delete a sales transaction."""
-    sale = await SalesTransaction.find_one(SalesTransaction.transaction_id == transaction_id)
-    if not sale:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Transaction {transaction_id} not found"
-        )
+    sale = await find_sale(transaction_id, store_id)
 
-    await sale.delete()
\ No newline at end of file
+    check_deadline()
+    await sale.delete()
+    await invalidation_bus.publish("forecast")
+    await reorder_index.refresh(sale.store_id, sale.sku)
@@ -1,7 +1,17 @@
-from fastapi import APIRouter, HTTPException, status
+import asyncio
+from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException, Query, status
 from models.stock_level import StockLevel
 from models.product import Product
 from models.product_order import ProductOrder
+from models.sales_transaction import SalesTransaction
+from core.cache import cache, cache_key, MISS
+from db.invalidation_bus import invalidation_bus
+from analytics.reorder import reorder_index
+from core.config import settings
+from db import queries
+from db.read_routing import read_many, aggregate
+from core.load_shedding import check_deadline, query_options
 from typing import List
 from pydantic import BaseModel
 
@@ -12,11 +22,29 @@ class StockLevelUpdate(BaseModel):
     stock_on_hand: int
 
 
+class StockSnapshot(BaseModel):
+    store_id: str
+    sku: str
+    stock_on_hand: int
+    pending_quantity: int
+    sold_quantity: int
+
+
+class VirtualStockLevel(BaseModel):
+    store_id: str
+    sku: str
+    stock_on_hand: int
+    virtual_stock: int
+
+
 @router.post("", response_model=StockLevel, status_code=status.HTTP_201_CREATED)
-async def create_stock_level(stock: StockLevel):
+async def create_stock_level(stock: StockLevel, store_id: str | None = None):
     """Create a new stock level entry."""
+    if store_id:
+        stock.store_id = store_id
+
     # Vérifier que le produit existe
-    product = await Product.find_one(Product.sku == stock.sku)
+    product = await Product.find_one(Product.sku == stock.sku, **query_options())
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -24,14 +52,17 @@ async def create_stock_level(stock: StockLevel):
         )
 
     # Vérifier que le stock n'existe pas déjà
-    existing = await StockLevel.find_one(StockLevel.sku == stock.sku)
+    existing = await StockLevel.find_one(StockLevel.store_id == stock.store_id, StockLevel.sku == stock.sku, **query_options())
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Stock level for SKU {stock.sku} already exists"
+            detail=f"Stock level for SKU {stock.sku} already exists in store {stock.store_id}"
         )
 
+    check_deadline()
     await stock.insert()
+    await invalidation_bus.publish("stocks")
+    await reorder_index.refresh(stock.store_id, stock.sku)
     return stock
 
 
@@ -41,39 +72,65 @@ async def list_stock_levels(
     min_stock: int | None = None,
     max_stock: int | None = None,
     limit: int = 100,
-    skip: int = 0
+    skip: int = 0,
+    store_id: str = settings.DEFAULT_STORE_ID
 ):
-    """List all stock levels with optional filters."""
-    conditions = []
-
-    if sku:
-        conditions.append(StockLevel.sku == sku)
-    if min_stock is not None:
-        conditions.append(StockLevel.stock_on_hand >= min_stock)
-    if max_stock is not None:
-        conditions.append(StockLevel.stock_on_hand <= max_stock)
-
-    if conditions:
-        stocks = await StockLevel.find(*conditions).skip(skip).limit(limit).to_list()
-    else:
-        stocks = await StockLevel.find_all().skip(skip).limit(limit).to_list()
+    """List all stock levels of a store with optional filters."""
+    key = cache_key(store_id=store_id, sku=sku, min_stock=min_stock, max_stock=max_stock, limit=limit, skip=skip)
+    cached = cache.get("stocks", key)
+    if cached is not MISS:
+        return cached
+
+    query = queries.stock_filter(store_id, sku=sku, min_stock=min_stock, max_stock=max_stock)
+    stocks = await StockLevel.find(query, **query_options()).skip(skip).limit(limit).to_list()
+    cache.set("stocks", key, stocks)
     return stocks
 
 
+@router.get("/snapshot", response_model=List[StockSnapshot])
+async def get_stock_snapshot(
+    days: int = 7,
+    skus: List[str] | None = Query(default=None),
+    store_id: str = settings.DEFAULT_STORE_ID
+):
+    """
+    Stock on hand, pending order quantity and quantity sold over the last `days` days per
+    SKU (all SKUs of the store by default). The sums are computed by MongoDB, not capped.
+    """
+    if days <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Days must be positive"
+        )
+    since = datetime.now() - timedelta(days=days)
+    stocks, pending, sold = await asyncio.gather(
+        read_many(StockLevel, queries.stock_filter(store_id, skus=skus), group="analytics"),
+        aggregate(ProductOrder, queries.pending_quantity_by_sku_pipeline(store_id, skus), group="analytics"),
+        aggregate(SalesTransaction, queries.sold_quantity_by_sku_pipeline(store_id, since, skus), group="analytics"),
+    )
+    return queries.stock_snapshot([stock.model_dump() for stock in stocks], pending, sold)
+
+
 @router.get("/{sku}", response_model=StockLevel)
-async def get_stock_level(sku: str):
+async def get_stock_level(sku: str, store_id: str = settings.DEFAULT_STORE_ID):
     """Get stock level for a specific product."""
-    stock = await StockLevel.find_one(StockLevel.sku == sku)
+    key = cache_key(store_id=store_id, sku=sku)
+    stock = cache.get("stocks", key)
+    if stock is not MISS:
+        return stock
+
+    stock = await StockLevel.find_one(StockLevel.store_id == store_id, StockLevel.sku == sku, **query_options())
     if not stock:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Stock level for SKU {sku} not found"
+            detail=f"Stock level for SKU {sku} not found in store {store_id}"
         )
+    cache.set("stocks", key, stock)
     return stock
 
 
 @router.put("/{sku}", response_model=StockLevel)
-async def update_stock_level(sku: str, update_data: StockLevelUpdate):
+async def update_stock_level(sku: str, update_data: StockLevelUpdate, store_id: str = settings.DEFAULT_STORE_ID):
     """Update stock level for a product."""
     if update_data.stock_on_hand < 0:
         raise HTTPException(
@@ -81,47 +138,59 @@ async def update_stock_level(sku: str, update_data: StockLevelUpdate):
             detail="Stock quantity must be non-negative"
         )
 
-    stock = await StockLevel.find_one(StockLevel.sku == sku)
+    stock = await StockLevel.find_one(StockLevel.store_id == store_id, StockLevel.sku == sku, **query_options())
     if not stock:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Stock level for SKU {sku} not found"
+            detail=f"Stock level for SKU {sku} not found in store {store_id}"
         )
 
     stock.stock_on_hand = update_data.stock_on_hand
+    check_deadline()
     await stock.save()
+    await invalidation_bus.publish("stocks")
+    await reorder_index.refresh(store_id, sku)
     return stock
 
 
 @router.delete("/{sku}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_stock_level(sku: str):
+async def delete_stock_level(sku: str, store_id: str = settings.DEFAULT_STORE_ID):
     """Delete stock level for a product."""
-    stock = await StockLevel.find_one(StockLevel.sku == sku)
+    stock = await StockLevel.find_one(StockLevel.store_id == store_id, StockLevel.sku == sku, **query_options())
     if not stock:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Stock level for SKU {sku} not found"
+            detail=f"Stock level for SKU {sku} not found in store {store_id}"
         )
 
+    check_deadline()
     await stock.delete()
+    await invalidation_bus.publish("stocks")
+    await reorder_index.refresh(store_id, sku)
 
 
-@router.get("/virtual/all", response_model=List[StockLevel])
-async def get_all_virtual_stock():
+@router.get("/virtual/all", response_model=List[VirtualStockLevel])
+async def get_all_virtual_stock(store_id: str = settings.DEFAULT_STORE_ID):
     """Get all stock levels with virtual stock (including pending orders)"""
-    stocks = await StockLevel.find_all().to_list()
-    result = []
-
-    for stock in stocks:
-        # Récupérer les commandes en attente pour ce produit
-        pending_orders = await ProductOrder.find(
-            ProductOrder.sku == stock.sku,
-            ProductOrder.status == "pending"
-        ).to_list()
-
-        virtual_stock = stock.stock_on_hand - sum(order.quantity for order in pending_orders)
-        stock_dict = stock.dict()
-        stock_dict["virtual_stock"] = virtual_stock
-        result.append(StockLevel(**stock_dict))
-
-    return result
\ No newline at end of file
+    key = cache_key(store_id=store_id, view="virtual/all")
+    cached = cache.get("stocks", key)
+    if cached is not MISS:
+        return cached
+
+    stocks = await read_many(StockLevel, queries.stock_filter(store_id), group="analytics")
+    # Quantities already ordered but not delivered yet, in one aggregation
+    pending = await aggregate(ProductOrder, queries.pending_quantity_by_sku_pipeline(store_id), group="analytics")
+    pending_quantities = {row["_id"]: row["quantity"] for row in pending}
+
+    result = [
+        VirtualStockLevel(
+            store_id=stock.store_id,
+            sku=stock.sku,
+            stock_on_hand=stock.stock_on_hand,
+            virtual_stock=stock.stock_on_hand + pending_quantities.get(stock.sku, 0)
+        )
+        for stock in stocks
+    ]
+
+    cache.set("stocks", key, result)
+    return result
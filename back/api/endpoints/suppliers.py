@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException, status
+from analytics.reorder import reorder_index
+from models.sku_supplier import SkuSupplier
+from core.load_shedding import check_deadline, query_options
+from typing import List
+
+router = APIRouter()
+
+
+@router.post("", response_model=SkuSupplier, status_code=status.HTTP_201_CREATED)
+async def set_sku_supplier(mapping: SkuSupplier):
+    """Create or replace the supplier of a SKU."""
+    existing = await SkuSupplier.find_one(SkuSupplier.sku == mapping.sku, **query_options())
+    if existing:
+        mapping.id = existing.id
+    check_deadline()
+    await mapping.save()
+    # The lead time drives the reorder point
+    await reorder_index.refresh_sku(mapping.sku)
+    return mapping
+
+
+@router.get("", response_model=List[SkuSupplier])
+async def list_sku_suppliers(supplier_id: str | None = None, limit: int = 100):
+    """List the SKU to supplier mapping."""
+    query = {"supplier_id": supplier_id} if supplier_id else {}
+    return await SkuSupplier.find(query, **query_options()).limit(limit).to_list()
+
+
+@router.get("/{sku}", response_model=SkuSupplier)
+async def get_sku_supplier(sku: str):
+    """Get the supplier of a SKU."""
+    mapping = await SkuSupplier.find_one(SkuSupplier.sku == sku, **query_options())
+    if not mapping:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No supplier for SKU {sku}"
+        )
+    return mapping
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .endpoints import agent_history, products, sales_transactions, stock_levels, product_orders
+from .endpoints import agent_history, forecasts, products, reorder, sales_transactions, stock_levels, product_orders, suppliers
 
 router = APIRouter()
 router.include_router(products.router, prefix="/products", tags=["products"])
@@ -7,3 +7,13 @@ router.include_router(sales_transactions.router, prefix="/sales", tags=["sales"]
 router.include_router(stock_levels.router, prefix="/stocks", tags=["stocks"])
 router.include_router(product_orders.router, prefix="/orders", tags=["orders"])
 router.include_router(agent_history.router, prefix="/agent", tags=["agent"])
+router.include_router(forecasts.router, prefix="/forecast", tags=["forecast"])
+router.include_router(reorder.router, prefix="/reorder", tags=["reorder"])
+router.include_router(suppliers.router, prefix="/sku_supplier", tags=["suppliers"])
+
+# Store-scoped routes: the store comes from the path instead of the `store_id` query parameter
+router.include_router(sales_transactions.router, prefix="/stores/{store_id}/sales", tags=["stores"])
+router.include_router(stock_levels.router, prefix="/stores/{store_id}/stocks", tags=["stores"])
+router.include_router(product_orders.router, prefix="/stores/{store_id}/orders", tags=["stores"])
+router.include_router(forecasts.router, prefix="/stores/{store_id}/forecast", tags=["stores"])
+router.include_router(reorder.router, prefix="/stores/{store_id}/reorder", tags=["stores"])
@@ -0,0 +1,70 @@
+import time
+from collections import OrderedDict
+from typing import Any
+from core.config import settings
+
+MISS = object()
+
+
+def cache_key(**params) -> str:
+    """Build a stable cache key from query parameters (None values are ignored)."""
+    return "&".join(f"{name}={value}" for name, value in sorted(params.items()) if value is not None)
+
+
+class ResponseCache:
+    """
+    In-process cache of read results, grouped by namespace ("products", "stocks", ...).
+
+    Entries expire after `max_staleness` seconds (or their own `ttl`), which bounds
+    staleness even when an invalidation coming from another worker is delayed or lost.
+    At most `max_entries` are kept: the least recently used entry is evicted first, and
+    expired entries are swept on `set` (at most once per `max_staleness`).
+    """
+
+    def __init__(self, max_staleness: float, enabled: bool = True, max_entries: int = 1000):
+        self.max_staleness = max_staleness
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], tuple[float, Any]] = OrderedDict()
+        self._last_sweep = time.monotonic()
+
+    def get(self, namespace: str, key: str):
+        if not self.enabled:
+            return MISS
+        entry = self._entries.get((namespace, key))
+        if entry is None:
+            return MISS
+        expires_at, value = entry
+        if time.monotonic() > expires_at:
+            del self._entries[(namespace, key)]
+            return MISS
+        self._entries.move_to_end((namespace, key))
+        return value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float | None = None):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if now - self._last_sweep > self.max_staleness:
+            self._sweep(now)
+        self._entries[(namespace, key)] = (now + (self.max_staleness if ttl is None else ttl), value)
+        self._entries.move_to_end((namespace, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def drop(self, *namespaces: str):
+        for entry_key in [entry_key for entry_key in self._entries if entry_key[0] in namespaces]:
+            del self._entries[entry_key]
+
+    def _sweep(self, now: float):
+        """Remove the expired entries."""
+        for entry_key in [entry_key for entry_key, (expires_at, _) in self._entries.items() if now > expires_at]:
+            del self._entries[entry_key]
+        self._last_sweep = now
+
+
+cache = ResponseCache(
+    settings.CACHE_MAX_STALENESS_SECONDS,
+    enabled=settings.CACHE_ENABLED,
+    max_entries=settings.CACHE_MAX_ENTRIES
+)
@@ -4,9 +4,38 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Retail Inventory"
     MONGO_URL: str
+    # Skip Beanie index synchronization when the stored schema version matches
+    FAST_STARTUP: bool = False
+    # In-process read cache, kept coherent across workers by the invalidation bus
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_STALENESS_SECONDS: float = 5.0
+    CACHE_MAX_ENTRIES: int = 1000
+    # Store used when a request does not specify one
+    DEFAULT_STORE_ID: str = "STORE-001"
+    # Read preference per route group ("analytics": sales listing, virtual stock), e.g.
+    # READ_PREFERENCES='{"analytics": "secondaryPreferred"}'. Unlisted groups read from the primary.
+    READ_PREFERENCES: dict[str, str] = {"analytics": "primary"}
+    # Staleness bound for secondary reads (-1 = no bound, MongoDB requires at least 90)
+    READ_MAX_STALENESS_SECONDS: int = -1
+    # Load shedding: concurrent requests, queued requests and deadline (seconds) per route group
+    ROUTE_GROUP_LIMITS: dict[str, dict] = {
+        "heavy": {"concurrency": 4, "queue": 8, "timeout": 10.0},
+        "default": {"concurrency": 64, "queue": 256, "timeout": 5.0},
+    }
+    LOAD_SHEDDING_RETRY_AFTER_SECONDS: int = 1
+    # Demand forecasting and restock policy
+    FORECAST_HISTORY_DAYS: int = 365
+    FORECAST_CACHE_SECONDS: float = 3600.0
+    RESTOCK_COVER_DAYS: int = 14
+    SAFETY_STOCK_DAYS: int = 2
+    # Reorder state: sales window of the velocity, lead time of SKUs without a supplier,
+    # and full rebuild period (the velocity window slides even without writes, 0 = never)
+    REORDER_VELOCITY_DAYS: int = 28
+    DEFAULT_LEAD_DAYS: int = 5
+    REORDER_REBUILD_INTERVAL_SECONDS: float = 3600.0
 
     class Config:
         env_file = ".env"
 
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
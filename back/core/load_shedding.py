@@ -0,0 +1,147 @@
+import asyncio
+import json
+import re
+import time
+from contextvars import ContextVar
+from fastapi import HTTPException, status
+from core.config import settings
+
+# Absolute deadline (time.monotonic()) of the request being served
+request_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+
+def remaining_ms() -> int | None:
+    """Time left before the current request deadline, to pass to MongoDB as maxTimeMS."""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return max(1, int((deadline - time.monotonic()) * 1000))
+
+
+def query_options() -> dict:
+    """Keyword arguments bounding a Beanie find/find_one/get by the request deadline (max_time_ms)."""
+    max_time_ms = remaining_ms()
+    return {"max_time_ms": max_time_ms} if max_time_ms else {}
+
+
+def command_options() -> dict:
+    """Keyword arguments bounding a raw aggregate/distinct command by the request deadline (maxTimeMS)."""
+    max_time_ms = remaining_ms()
+    return {"maxTimeMS": max_time_ms} if max_time_ms else {}
+
+
+def check_deadline():
+    """
+    Stop a handler whose request deadline has passed, before it starts a write
+    (MongoDB has no maxTimeMS for inserts, updates and deletes).
+    """
+    deadline = request_deadline.get()
+    if deadline is not None and time.monotonic() >= deadline:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Request deadline exceeded, retry later",
+            headers={"Retry-After": str(settings.LOAD_SHEDDING_RETRY_AFTER_SECONDS)},
+        )
+
+
+# Path pattern of each route group of settings.ROUTE_GROUP_LIMITS
+ROUTE_GROUP_PATTERNS = {
+    # Endpoints doing one query per SKU, aggregations over the sales, demand forecasting
+    "heavy": r"^/api/(stores/[^/]+/)?(stocks/(virtual|snapshot)|forecast)",
+    "default": r"^/api/",
+}
+
+
+class RouteGroup:
+    """Requests sharing a concurrency limit, a bounded wait queue and a deadline."""
+
+    def __init__(self, name: str, pattern: str, concurrency: int, queue: int, timeout: float):
+        self.name = name
+        self.pattern = re.compile(pattern)
+        self.queue = queue
+        self.timeout = timeout
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def acquire(self) -> bool:
+        """Wait for a slot; False when the queue is full or the deadline passes first."""
+        if self._semaphore.locked() and self.waiting >= self.queue:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+
+    def release(self):
+        self._semaphore.release()
+
+
+class LoadSheddingMiddleware:
+    """
+    Bounds the work accepted by the API, per route group.
+
+    A request waits for a slot of its group, and is rejected right away with
+    503 + Retry-After when the group queue is full. The group deadline is
+    propagated to MongoDB through `remaining_ms()`.
+    """
+
+    def __init__(self, app, groups: list[RouteGroup]):
+        self.app = app
+        self.groups = groups
+
+    def _match(self, path: str) -> RouteGroup | None:
+        for group in self.groups:
+            if group.pattern.match(path):
+                return group
+        return None
+
+    async def __call__(self, scope, receive, send):
+        group = self._match(scope["path"]) if scope["type"] == "http" else None
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        token = request_deadline.set(time.monotonic() + group.timeout)
+        try:
+            if not await group.acquire():
+                print(f"[LoadShedding] Rejected {scope['path']} ({group.name} group saturated)")
+                await send_overloaded(send, group.name)
+                return
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                group.release()
+        finally:
+            request_deadline.reset(token)
+
+
+async def send_overloaded(send, detail: str):
+    body = json.dumps({"detail": f"Service overloaded ({detail}), retry later"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(settings.LOAD_SHEDDING_RETRY_AFTER_SECONDS).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def build_route_groups() -> list[RouteGroup]:
+    """Route groups from settings.ROUTE_GROUP_LIMITS, matched in order."""
+    unknown = sorted(set(settings.ROUTE_GROUP_LIMITS) - set(ROUTE_GROUP_PATTERNS))
+    if unknown:
+        raise ValueError(
+            f"ROUTE_GROUP_LIMITS names unknown route groups: {', '.join(unknown)} "
+            f"(known groups: {', '.join(ROUTE_GROUP_PATTERNS)})"
+        )
+    return [
+        RouteGroup(name, ROUTE_GROUP_PATTERNS[name], **limits)
+        for name, limits in settings.ROUTE_GROUP_LIMITS.items()
+    ]
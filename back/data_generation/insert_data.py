@@ -49,4 +49,4 @@ if __name__ == "__main__":
     asyncio.run(insert_product(products_df))
     asyncio.run(insert_sale(sales_df))
     asyncio.run(insert_stock(stock_df))
-    #asyncio.run(insert_sku_supplier(sku_supplier))
\ No newline at end of file
+    asyncio.run(insert_sku_supplier(sku_supplier))
\ No newline at end of file
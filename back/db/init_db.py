@@ -1,22 +1,76 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
 from beanie import init_beanie
 from models.product import Product
 from models.sales_transaction import SalesTransaction
 from models.stock_level import StockLevel
 from models.product_order import ProductOrder
 from models.agent_history import AgentHistory
+from models.reorder_state import ReorderState
+from models.sku_supplier import SkuSupplier
 from core.config import settings
+from core.startup import startup_profiler
+
+# Bump this whenever an index is added, removed or changed on a document model,
+# otherwise FAST_STARTUP will keep skipping the index synchronization.
+SCHEMA_VERSION = "4"
+SCHEMA_MARKER_COLLECTION = "schema_meta"
+SCHEMA_MARKER_ID = "indexes"
+STORE_PARTITIONED_COLLECTIONS = ["stock_levels", "sales_transactions", "product_orders"]
+
+
+async def migrate_store_partitioning(db):
+    """Assign documents created before multi-store support to the default store."""
+    for name in STORE_PARTITIONED_COLLECTIONS:
+        result = await db[name].update_many(
+            {"store_id": {"$exists": False}},
+            {"$set": {"store_id": settings.DEFAULT_STORE_ID}}
+        )
+        if result.modified_count:
+            print(f"[Migration] {name}: {result.modified_count} documents assigned to {settings.DEFAULT_STORE_ID}")
+
+    # The SKU alone is no longer unique: it is unique per store (store_sku index)
+    try:
+        await db["stock_levels"].drop_index("sku_1")
+    except OperationFailure:
+        pass
+
 
 async def init_db():
-    client = AsyncIOMotorClient(settings.MONGO_URL)
-    db = client.get_default_database()
-
-    await init_beanie(database=db, document_models=[
-        Product,
-        SalesTransaction,
-        StockLevel,
-        ProductOrder,
-        AgentHistory
-    ])
-
-    print(f"Database initialized: {db.name}")
\ No newline at end of file
+    with startup_profiler.phase("db_connect"):
+        client = AsyncIOMotorClient(settings.MONGO_URL)
+        db = client.get_default_database()
+        await db.command("ping")
+
+    marker_collection = db[SCHEMA_MARKER_COLLECTION]
+    skip_indexes = False
+    if settings.FAST_STARTUP:
+        marker = await marker_collection.find_one({"_id": SCHEMA_MARKER_ID})
+        skip_indexes = marker is not None and marker.get("version") == SCHEMA_VERSION
+
+    if not skip_indexes:
+        await migrate_store_partitioning(db)
+
+    with startup_profiler.phase("beanie_init"):
+        await init_beanie(database=db, document_models=[
+            Product,
+            SalesTransaction,
+            StockLevel,
+            ProductOrder,
+            AgentHistory,
+            ReorderState,
+            SkuSupplier
+        ], skip_indexes=skip_indexes)
+
+    if skip_indexes:
+        startup_profiler.index_sync = "skipped"
+    else:
+        startup_profiler.index_sync = "synchronized"
+        await marker_collection.update_one(
+            {"_id": SCHEMA_MARKER_ID},
+            {"$set": {"version": SCHEMA_VERSION}},
+            upsert=True
+        )
+
+    print(f"Database initialized: {db.name} (indexes {startup_profiler.index_sync}, schema v{SCHEMA_VERSION})")
+    return db
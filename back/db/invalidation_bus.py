@@ -0,0 +1,86 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timezone
+from pymongo import CursorType, DESCENDING
+from pymongo.errors import CollectionInvalid
+from core.cache import cache
+
+INVALIDATION_COLLECTION = "invalidation_events"
+INVALIDATION_COLLECTION_SIZE = 1024 * 1024
+INVALIDATION_COLLECTION_MAX = 10000
+
+
+class InvalidationBus:
+    """
+    Propagates cache invalidations between uvicorn workers.
+
+    Every write publishes an event in the capped `invalidation_events` collection;
+    each worker tails it and drops the matching namespaces from its own cache.
+    A capped collection is used instead of change streams so it also works on a
+    standalone MongoDB (no replica set required).
+    """
+
+    def __init__(self):
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.collection = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self, db):
+        try:
+            await db.create_collection(
+                INVALIDATION_COLLECTION,
+                capped=True,
+                size=INVALIDATION_COLLECTION_SIZE,
+                max=INVALIDATION_COLLECTION_MAX
+            )
+        except CollectionInvalid:
+            # Already created by another worker
+            pass
+
+        self.collection = db[INVALIDATION_COLLECTION]
+        last_event = await self.collection.find_one(sort=[("$natural", DESCENDING)])
+        last_id = last_event["_id"] if last_event else None
+        self._task = asyncio.create_task(self._tail(last_id))
+        print(f"[Cache] Invalidation bus started (worker {self.worker_id})")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def publish(self, *namespaces: str):
+        """Drop namespaces from the local cache and notify the other workers."""
+        cache.drop(*namespaces)
+        if self.collection is None:
+            return
+        try:
+            await self.collection.insert_one({
+                "namespaces": list(namespaces),
+                "origin": self.worker_id,
+                "timestamp": datetime.now(timezone.utc)
+            })
+        except Exception as e:
+            # Other workers will still converge once their entries expire
+            print(f"[Cache] Error publishing invalidation {namespaces}: {e}")
+
+    async def _tail(self, last_id):
+        while True:
+            try:
+                query = {"_id": {"$gt": last_id}} if last_id else {}
+                cursor = self.collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for event in cursor:
+                        last_id = event["_id"]
+                        if event.get("origin") != self.worker_id:
+                            cache.drop(*event.get("namespaces", []))
+                    await asyncio.sleep(0.1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[Cache] Invalidation tail error: {e}")
+            # A tailable cursor dies on an empty collection; retry shortly
+            await asyncio.sleep(1)
+
+
+invalidation_bus = InvalidationBus()
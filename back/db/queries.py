@@ -0,0 +1,166 @@
+"""
+MongoDB query and aggregation definitions shared by the API and the MCP server.
+
+This module only depends on the standard library so that the MCP server can import
+it in direct-MongoDB mode (see MCP_DATA_BACKEND in llm/mcp/server.py) and run
+exactly the same queries as the API endpoints.
+"""
+from datetime import datetime, timedelta
+
+PRODUCTS = "products"
+SALES_TRANSACTIONS = "sales_transactions"
+STOCK_LEVELS = "stock_levels"
+PRODUCT_ORDERS = "product_orders"
+REORDER_STATE = "reorder_state"
+
+# Most urgent first
+AT_RISK_SORT = [("days_of_cover", 1)]
+
+
+def products_filter(
+    category: str | None = None,
+    sku: str | None = None,
+    name: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+) -> dict:
+    query = {}
+    if category:
+        query["category"] = category
+    if sku:
+        query["sku"] = sku
+    if name:
+        # Case-insensitive partial match
+        query["name"] = {"$regex": name, "$options": "i"}
+    price = {}
+    if min_price is not None:
+        price["$gte"] = min_price
+    if max_price is not None:
+        price["$lte"] = max_price
+    if price:
+        query["price"] = price
+    return query
+
+
+def sales_filter(
+    store_id: str,
+    days: int | None = None,
+    sku: str | None = None,
+    min_quantity: int | None = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+) -> dict:
+    query = {"store_id": store_id}
+    period = []
+    if days is not None:
+        period.append({"timestamp": {"$gte": datetime.now() - timedelta(days=days)}})
+    if start_date:
+        period.append({"timestamp": {"$gte": start_date}})
+    if end_date:
+        period.append({"timestamp": {"$lte": end_date}})
+    if period:
+        query["$and"] = period
+    if sku:
+        query["sku"] = sku
+    if min_quantity is not None:
+        query["quantity"] = {"$gte": min_quantity}
+    return query
+
+
+def stock_filter(
+    store_id: str,
+    sku: str | None = None,
+    min_stock: int | None = None,
+    max_stock: int | None = None,
+    skus: list[str] | None = None,
+) -> dict:
+    query = {"store_id": store_id}
+    if sku:
+        query["sku"] = sku
+    elif skus:
+        query["sku"] = {"$in": skus}
+    stock_on_hand = {}
+    if min_stock is not None:
+        stock_on_hand["$gte"] = min_stock
+    if max_stock is not None:
+        stock_on_hand["$lte"] = max_stock
+    if stock_on_hand:
+        query["stock_on_hand"] = stock_on_hand
+    return query
+
+
+def orders_filter(store_id: str, status: str | None = None, days: int | None = None) -> dict:
+    query = {"store_id": store_id}
+    if status:
+        query["status"] = status
+    if days is not None:
+        cutoff_date = datetime.now() - timedelta(days=days)
+        # With a status: orders of the last N days, without: orders older than N days
+        query["order_date"] = {"$gte": cutoff_date} if status else {"$lt": cutoff_date}
+    return query
+
+
+def pending_quantity_by_sku_pipeline(store_id: str, skus: list[str] | None = None) -> list[dict]:
+    """Total pending order quantity per SKU (the part of the stock already on its way)."""
+    match = {"store_id": store_id, "status": "pending"}
+    if skus:
+        match["sku"] = {"$in": skus}
+    return [
+        {"$match": match},
+        {"$group": {"_id": "$sku", "quantity": {"$sum": "$quantity"}}},
+    ]
+
+
+def sold_quantity_by_sku_pipeline(store_id: str, since: datetime, skus: list[str] | None = None) -> list[dict]:
+    """Total quantity sold per SKU since a date."""
+    match = {"store_id": store_id, "timestamp": {"$gte": since}}
+    if skus:
+        match["sku"] = {"$in": skus}
+    return [
+        {"$match": match},
+        {"$group": {"_id": "$sku", "quantity": {"$sum": "$quantity"}}},
+    ]
+
+
+def stock_snapshot(stocks: list[dict], pending: list[dict], sold: list[dict]) -> list[dict]:
+    """
+    Join stock levels with the results of pending_quantity_by_sku_pipeline and
+    sold_quantity_by_sku_pipeline: stock on hand, pending and sold quantity per SKU.
+    """
+    pending_quantities = {row["_id"]: row["quantity"] for row in pending}
+    sold_quantities = {row["_id"]: row["quantity"] for row in sold}
+    return [
+        {
+            "store_id": stock["store_id"],
+            "sku": stock["sku"],
+            "stock_on_hand": stock["stock_on_hand"],
+            "pending_quantity": pending_quantities.get(stock["sku"], 0),
+            "sold_quantity": sold_quantities.get(stock["sku"], 0),
+        }
+        for stock in stocks
+    ]
+
+
+def at_risk_filter(store_id: str) -> dict:
+    """SKUs whose virtual stock is at or below their reorder point (store_at_risk_cover index)."""
+    return {"store_id": store_id, "at_risk": True}
+
+
+def daily_sales_pipeline(store_id: str, since: datetime, until: datetime) -> list[dict]:
+    """
+    Quantity sold per SKU and per day from `since` to `until` (UTC midnights, `until`
+    excluded), one document per SKU:
+    {"_id": sku, "days": [day offsets from `since`], "quantities": [quantity of each day]}.
+    """
+    return [
+        {"$match": {"store_id": store_id, "timestamp": {"$gte": since, "$lt": until}}},
+        {"$group": {
+            "_id": {"sku": "$sku", "day": {"$dateDiff": {"startDate": since, "endDate": "$timestamp", "unit": "day"}}},
+            "quantity": {"$sum": "$quantity"},
+        }},
+        {"$group": {
+            "_id": "$_id.sku",
+            "days": {"$push": "$_id.day"},
+            "quantities": {"$push": "$quantity"},
+        }},
+    ]
@@ -0,0 +1,58 @@
+from typing import List, Type, TypeVar
+from beanie import Document
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+from core.config import settings
+from core.load_shedding import command_options, remaining_ms
+
+DocumentT = TypeVar("DocumentT", bound=Document)
+
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def read_preference(group: str):
+    """
+    Read preference of a route group, from settings.READ_PREFERENCES.
+
+    Groups that are not configured (writes, read-your-write paths) read from the primary.
+    """
+    mode = settings.READ_PREFERENCES.get(group, "primary")
+    if mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"Unknown read preference '{mode}' for route group '{group}'")
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCE_MODES[mode](max_staleness=settings.READ_MAX_STALENESS_SECONDS)
+
+
+async def read_many(
+    model: Type[DocumentT],
+    *conditions,
+    group: str,
+    skip: int = 0,
+    limit: int = 0,
+) -> List[DocumentT]:
+    """
+    Run a Beanie find on the replica set members selected by the route group,
+    bounded by the request deadline.
+    """
+    query = model.find(*conditions).get_filter_query()
+    collection = model.get_pymongo_collection().with_options(read_preference=read_preference(group))
+    cursor = collection.find(query, skip=skip, limit=limit, max_time_ms=remaining_ms())
+    return [model.model_validate(document) async for document in cursor]
+
+
+async def aggregate(model: Type[Document], pipeline: list[dict], group: str) -> list[dict]:
+    """Run an aggregation pipeline like read_many, returning the raw result documents."""
+    collection = model.get_pymongo_collection().with_options(read_preference=read_preference(group))
+    return [row async for row in collection.aggregate(pipeline, **command_options())]
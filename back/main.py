@@ -1,12 +1,22 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
+import time
+
+# Start of the readiness clock: everything below, imports included, counts toward first_request
+_imports_started = time.perf_counter()
 
-app = FastAPI()
+from fastapi import FastAPI, Request, status
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from pymongo.errors import ExecutionTimeout
 from db.init_db import init_db
 from api.router import router
 from core.config import settings
+from core.startup import FirstRequestMiddleware, startup_profiler
+from db.invalidation_bus import invalidation_bus
+from analytics.reorder import reorder_index
+from core.load_shedding import LoadSheddingMiddleware, build_route_groups
 
+startup_profiler.start(_imports_started)
+startup_profiler.record("imports", _imports_started)
 
 
 app = FastAPI(
@@ -14,6 +24,11 @@ app = FastAPI(
     version="1.0.0",
 )
 
+app.add_middleware(FirstRequestMiddleware)
+
+# Concurrency limits per route group (added first so CORS headers wrap the 503s)
+app.add_middleware(LoadSheddingMiddleware, groups=build_route_groups())
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -26,6 +41,16 @@ app.add_middleware(
 app.include_router(router, prefix="/api")
 
 
+@app.exception_handler(ExecutionTimeout)
+async def query_deadline_exceeded(request: Request, exc: ExecutionTimeout):
+    """A MongoDB query ran past the request deadline (maxTimeMS)."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Request deadline exceeded, retry later"},
+        headers={"Retry-After": str(settings.LOAD_SHEDDING_RETRY_AFTER_SECONDS)},
+    )
+
+
 @app.get("/")
 async def root():
     return {"greeting": "Hello world", "project": settings.PROJECT_NAME}
@@ -36,9 +61,25 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/health/startup")
+async def startup_report():
+    """Startup timing breakdown (imports, DB connect, Beanie init, first request)."""
+    return startup_profiler.report()
+
+
 @app.on_event("startup")
 async def on_startup():
-    await init_db()
+    db = await init_db()
+    await invalidation_bus.start(db)
+    await reorder_index.start()
+    print(f"[Startup] {startup_profiler.report()}")
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await invalidation_bus.stop()
+    await reorder_index.stop()
 
 if __name__ == "__main__":
-    uvicorn.run(app)
\ No newline at end of file
+    import uvicorn
+    uvicorn.run(app)
@@ -1,5 +1,6 @@
 from beanie import Document, Indexed
 from pydantic import Field
+from pymongo import ASCENDING, IndexModel
 from datetime import datetime, timezone
 import uuid
 from typing import Literal
@@ -8,16 +9,23 @@ class AgentHistory(Document):
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="Date and time of the history entry")
     response: str = Field(..., description="Agent's response to the user query")
     type: Literal["answer", "tool"] = Field(default="answer", description="Type of the agent interaction")
+    run_id: str | None = Field(default=None, description="Agent run (query, restock) the entry belongs to")
+    iteration: int | None = Field(default=None, description="Agent loop iteration of the entry within its run")
 
     class Settings:
         name = "agent_history"
         use_state_management = True
+        indexes = [
+            IndexModel([("run_id", ASCENDING), ("iteration", ASCENDING)], name="run_iteration"),
+        ]
 
     class Config:
         json_schema_extra = {
             "example": {
                 "timestamp": "2025-10-28T10:30:00Z",
                 "response": "The current stock level for SKU123 is 150 units.",
-                "type": "answer"
+                "type": "answer",
+                "run_id": "3f2b8c1e9d7a4b6c8e0f1a2b3c4d5e6f",
+                "iteration": 2
             }
         }
\ No newline at end of file
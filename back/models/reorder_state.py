@@ -0,0 +1,43 @@
+from beanie import Document
+from pydantic import Field
+from datetime import datetime, timezone
+from pymongo import ASCENDING, IndexModel
+from core.config import settings
+
+
+class ReorderState(Document):
+    store_id: str = Field(default=settings.DEFAULT_STORE_ID, description="Store holding the stock")
+    sku: str = Field(..., description="Product identifier (matches products.sku)")
+    stock_on_hand: int = Field(..., description="Current quantity in stock")
+    pending_quantity: int = Field(default=0, description="Quantity of the pending orders")
+    virtual_stock: int = Field(..., description="Stock on hand plus pending orders")
+    daily_velocity: float = Field(..., description="Average daily sales over REORDER_VELOCITY_DAYS")
+    lead_time_days: int = Field(..., description="Supplier lead time (po_lead_days)")
+    reorder_point: int = Field(..., description="Stock needed to cover the lead time plus the safety stock")
+    days_of_cover: float | None = Field(default=None, description="Days until the virtual stock runs out (None without sales)")
+    at_risk: bool = Field(..., description="Virtual stock at or below the reorder point")
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="Last refresh")
+
+    class Settings:
+        name = "reorder_state"
+        indexes = [
+            IndexModel([("store_id", ASCENDING), ("sku", ASCENDING)], unique=True, name="store_sku"),
+            IndexModel([("store_id", ASCENDING), ("at_risk", ASCENDING), ("days_of_cover", ASCENDING)], name="store_at_risk_cover"),
+        ]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "store_id": "STORE-001",
+                "sku": "SKU123",
+                "stock_on_hand": 12,
+                "pending_quantity": 0,
+                "virtual_stock": 12,
+                "daily_velocity": 4.5,
+                "lead_time_days": 3,
+                "reorder_point": 23,
+                "days_of_cover": 2.7,
+                "at_risk": True,
+                "updated_at": "2025-10-28T10:30:00Z"
+            }
+        }
@@ -0,0 +1,23 @@
+from beanie import Document, Indexed
+from pydantic import Field
+
+
+class SkuSupplier(Document):
+    sku: Indexed(str, unique=True) = Field(..., description="Product identifier (matches products.sku)")
+    supplier_id: str = Field(..., description="Supplier identifier")
+    supplier_name: str = Field(..., description="Supplier name")
+    po_lead_days: int = Field(..., ge=0, description="Days between a purchase order and its delivery")
+
+    class Settings:
+        name = "sku_supplier"
+        use_state_management = True
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "sku": "SKU123",
+                "supplier_id": "SUP-A002",
+                "supplier_name": "Northern Supply Group",
+                "po_lead_days": 3
+            }
+        }
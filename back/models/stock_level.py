@@ -1,18 +1,26 @@
-from beanie import Document, Indexed
+from beanie import Document
 from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+from core.config import settings
 
 
 class StockLevel(Document):
-    sku: Indexed(str, unique=True) = Field(..., description="Product identifier (matches products.sku)")
+    store_id: str = Field(default=settings.DEFAULT_STORE_ID, description="Store holding the stock")
+    sku: str = Field(..., description="Product identifier (matches products.sku)")
     stock_on_hand: int = Field(..., ge=0, description="Current quantity in stock")
 
     class Settings:
         name = "stock_levels"
         use_state_management = True
+        indexes = [
+            IndexModel([("store_id", ASCENDING), ("sku", ASCENDING)], unique=True, name="store_sku"),
+            IndexModel([("store_id", ASCENDING), ("stock_on_hand", ASCENDING)], name="store_stock_on_hand"),
+        ]
 
     class Config:
         json_schema_extra = {
             "example": {
+                "store_id": "STORE-001",
                 "sku": "SKU123",
                 "stock_on_hand": 150
             }
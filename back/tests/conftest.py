@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Modules are imported as in the container (working directory back/); settings need a MongoDB URL
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017/inventory")
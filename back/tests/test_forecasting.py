@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from analytics import forecasting
+from db import queries
+
+
+def test_build_demand_matrix_pivots_days():
+    rows = [
+        {"_id": "SKU-A", "days": [0, 2], "quantities": [1, 3]},
+        {"_id": "SKU-B", "days": [1], "quantities": [5]},
+    ]
+    skus, demand = forecasting.build_demand_matrix(rows, 3)
+    assert skus == ["SKU-A", "SKU-B"]
+    np.testing.assert_array_equal(demand, [[1, 0, 3], [0, 5, 0]])
+
+
+def test_build_demand_matrix_drops_days_after_the_axis():
+    # A sale dated after today lands past the last day of the matrix
+    skus, demand = forecasting.build_demand_matrix([{"_id": "SKU-A", "days": [0, 5], "quantities": [1, 2]}], 5)
+    np.testing.assert_array_equal(demand, [[1, 0, 0, 0, 0]])
+
+
+def test_history_window_is_utc_and_ends_after_today():
+    since, until = forecasting.history_window(30)
+    today = datetime.now(timezone.utc).date()
+    assert since.tzinfo == timezone.utc and until.tzinfo == timezone.utc
+    assert since.date() == today - timedelta(days=30)
+    assert until.date() == today + timedelta(days=1)
+    assert (until - since).days == 31
+
+
+def test_daily_sales_pipeline_excludes_future_sales():
+    since, until = forecasting.history_window(30)
+    match = queries.daily_sales_pipeline("STORE-001", since, until)[0]["$match"]
+    assert match["timestamp"] == {"$gte": since, "$lt": until}
+
+
+def test_forecast_ignores_a_sale_dated_in_the_future(monkeypatch):
+    async def load_daily_sales(store_id, since, until):
+        n_days = (until - since).days
+        return [{"_id": "SKU-A", "days": [n_days - 2, n_days - 1, n_days + 3], "quantities": [4, 4, 100]}]
+
+    monkeypatch.setattr(forecasting, "load_daily_sales", load_daily_sales)
+    monkeypatch.setattr(forecasting.cache, "enabled", False)
+    forecast = asyncio.run(forecasting.forecast_daily_demand("STORE-FUTURE", 7))
+    assert forecast["SKU-A"].shape == (7,)
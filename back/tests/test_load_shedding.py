@@ -0,0 +1,28 @@
+import time
+
+import pytest
+
+from core.load_shedding import LoadSheddingMiddleware, build_route_groups, command_options, query_options, request_deadline
+
+
+@pytest.mark.parametrize("path, group", [
+    ("/api/stocks/snapshot", "heavy"),
+    ("/api/stores/STORE-002/stocks/snapshot", "heavy"),
+    ("/api/stocks/virtual/all", "heavy"),
+    ("/api/forecast/restock", "heavy"),
+    ("/api/stocks", "default"),
+])
+def test_route_groups(path, group):
+    middleware = LoadSheddingMiddleware(None, build_route_groups())
+    assert middleware._match(path).name == group
+
+
+def test_deadline_options():
+    assert query_options() == {} and command_options() == {}
+
+    token = request_deadline.set(time.monotonic() + 2)
+    try:
+        assert 0 < query_options()["max_time_ms"] <= 2000
+        assert 0 < command_options()["maxTimeMS"] <= 2000
+    finally:
+        request_deadline.reset(token)
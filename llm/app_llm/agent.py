@@ -1,48 +1,193 @@
+import ast
 import asyncio
-#from llama_cpp import Llama
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+from functools import partial
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
 import json
-from typing import List, Dict
+from typing import List, Dict, Literal, get_args
 import re as regex
 import json
-from httpx import AsyncClient
 from datetime import datetime, timezone
+from app_llm import tool_calls as structured
+from app_llm.context import PromptContext
+from app_llm.events import AgentEventStream
+from app_llm.history import HistoryWriter
+from app_llm.backends import LLMBackend, create_backend
 import os
 
 FASTAPI_BASE_URL = os.getenv("FASTAPI_URL", "http://back:8000/api")
+# URL of the long-lived MCP service (streamable HTTP); without it a stdio subprocess is spawned per query
+MCP_SERVER_URL = os.getenv("MCP_SERVER_URL")
+MCP_CONNECT_RETRIES = int(os.getenv("MCP_CONNECT_RETRIES", "5"))
+MCP_CONNECT_BACKOFF = float(os.getenv("MCP_CONNECT_BACKOFF", "0.5"))
+# The MCP session is kept open between queries and pinged when idle for longer than this
+MCP_HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", "30"))
+MCP_PING_TIMEOUT = float(os.getenv("MCP_PING_TIMEOUT", "5"))
+# Structured tool calls (JSON schema grammar for llama.cpp and the scripted stub, native
+# function calling for the hosted model); false falls back to parsing "TOOL_CALL: name(args)" lines
+STRUCTURED_TOOL_CALLS = os.getenv("STRUCTURED_TOOL_CALLS", "true").lower() == "true"
+# Independent tool calls of a response run concurrently, at most this many at a time
+TOOL_CALL_CONCURRENCY = int(os.getenv("TOOL_CALL_CONCURRENCY", "4"))
 
+# Routine restock: "planner" (at-risk query + ordering policy, no LLM) or "llm" (the agent reasons with the tools)
+RestockMode = Literal["planner", "llm"]
+RESTOCK_MODE = os.getenv("RESTOCK_MODE", "planner")
+RESTOCK_DAYS = int(os.getenv("RESTOCK_DAYS", "7"))
+# Let the LLM write a short summary of the planner result
+RESTOCK_SUMMARY = os.getenv("RESTOCK_SUMMARY", "false").lower() == "true"
+RESTOCK_QUERY = "Based of the daily sales, determine the products that will run out of stock in the next 7 days. After identifying them, place orders to restock each products with its sufficient amount to last a least one week. If no products need restocking, simply respond with [DONE]."
+
+
+
+class InferenceCancelled(Exception):
+    """Raised in an inference worker to stop generating for a cancelled run."""
 
 
 class RetailInventoryAgent:
     """LLM Agent with MCP tools for retail inventory management."""
 
-    def __init__(self, model_path: str):
-        #print(f"[Agent] Loading model from {model_path}")
-        """self.llm = Llama(
-            model_path=model_path,
-            n_ctx=8192,
-            n_threads=8,
-            n_gpu_layers=0,
-            verbose=False,
-        )"""
-        api_key = load_dotenv()
-        genai.configure(api_key=api_key)
-        self.llm = genai.GenerativeModel("models/gemini-2.5-flash-lite")
-        print("[Agent] Model loaded successfully")
-
-    async def _save_to_history(self, response: str, history_type: str):
-        """Save agent interaction to database history (not local_history)."""
+    def __init__(self, model_path: str | None = None, backend: LLMBackend | None = None):
+        # LLM_BACKEND (llama, gemini or scripted) unless a backend is given
+        self.llm = backend or create_backend(model_path=model_path)
+        self._inference = ThreadPoolExecutor(max_workers=self.llm.workers, thread_name_prefix="llm-inference")
+        print(f"[Agent] Model loaded successfully ({self.llm.name} backend)")
+
+        # Long-lived MCP session, with the tool list and system prompt built from it
+        self._session: ClientSession | None = None
+        self._session_task: asyncio.Task | None = None
+        self._session_closing: asyncio.Event | None = None
+        self._session_lock = asyncio.Lock()
+        self._last_health_check = 0.0
+        self._tools = []
+        self._system_prompt = ""
+        self._grammar = None
+        self._function_declarations = []
+        self._read_only_tools = set()
+        self._tool_slots = asyncio.Semaphore(TOOL_CALL_CONCURRENCY)
+        self._history = HistoryWriter(FASTAPI_BASE_URL)
+        if not STRUCTURED_TOOL_CALLS:
+            self._tool_call_mode = "text"
+        elif self.llm.supports_grammar:
+            self._tool_call_mode = "grammar"
+        elif self.llm.supports_functions:
+            self._tool_call_mode = "native"
+        else:
+            self._tool_call_mode = "text"
+
+    @asynccontextmanager
+    async def _open_session(self):
+        """
+        Open an initialized MCP session: over streamable HTTP to the long-lived MCP
+        service when MCP_SERVER_URL is set, otherwise on a stdio subprocess.
+        Connection failures are retried with exponential backoff.
+        """
+        for attempt in range(MCP_CONNECT_RETRIES):
+            stack = AsyncExitStack()
+            try:
+                if MCP_SERVER_URL:
+                    read, write, _ = await stack.enter_async_context(streamablehttp_client(MCP_SERVER_URL))
+                else:
+                    server_params = StdioServerParameters(
+                        command="python",
+                        args=["mcp/server.py"],
+                    )
+                    read, write = await stack.enter_async_context(stdio_client(server_params))
+                session = await stack.enter_async_context(ClientSession(read, write))
+                await session.initialize()
+            except Exception as e:
+                await stack.aclose()
+                if attempt == MCP_CONNECT_RETRIES - 1:
+                    raise
+                delay = MCP_CONNECT_BACKOFF * 2 ** attempt
+                print(f"[Agent] MCP connection failed ({e}), retrying in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+                continue
+
+            async with stack:
+                yield session
+            return
+
+    async def _hold_session(self, ready: asyncio.Future, closing: asyncio.Event):
+        """
+        Keep an MCP session open until `closing` is set. The session lives in its own task
+        because its anyio contexts must be exited by the task that entered them.
+        """
         try:
-            async with AsyncClient() as client:
-                history_data = {
-                    "timestamp": datetime.now(timezone.utc).isoformat(),
-                    "response": response,
-                    "type": history_type
-                }
-                await client.post(f"{FASTAPI_BASE_URL}/agent", json=history_data)
+            async with self._open_session() as session:
+                ready.set_result(session)
+                await closing.wait()
         except Exception as e:
-            print(f"[History] Error saving to history: {e}")
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                print(f"[Agent] MCP session lost: {e}")
+
+    async def _get_session(self) -> ClientSession:
+        """
+        Return the long-lived MCP session, checking it with a ping when it has been idle
+        and restarting it (with a fresh tool list and system prompt) when it is gone.
+        """
+        async with self._session_lock:
+            if self._session is not None and not self._session_task.done():
+                if time.monotonic() - self._last_health_check < MCP_HEALTH_CHECK_INTERVAL:
+                    return self._session
+                try:
+                    await asyncio.wait_for(self._session.send_ping(), MCP_PING_TIMEOUT)
+                    self._last_health_check = time.monotonic()
+                    return self._session
+                except Exception as e:
+                    print(f"[Agent] MCP health check failed ({e!r}), restarting the session")
+
+            await self._close_session()
+            ready = asyncio.get_running_loop().create_future()
+            self._session_closing = asyncio.Event()
+            self._session_task = asyncio.create_task(self._hold_session(ready, self._session_closing))
+            self._session = await ready
+            self._last_health_check = time.monotonic()
+
+            tools_response = await self._session.list_tools()
+            self._tools = tools_response.tools
+            self._system_prompt = self._build_system_prompt(self._tools)
+            self._read_only_tools = {
+                tool.name for tool in self._tools
+                if tool.annotations is not None and tool.annotations.readOnlyHint
+            }
+            if self._tool_call_mode == "grammar":
+                self._grammar = self.llm.grammar(structured.response_schema(self._tools))
+            elif self._tool_call_mode == "native":
+                self._function_declarations = structured.function_declarations(self._tools)
+            # Every prompt starts with the system prompt: the local model evaluates it once
+            await self._in_executor(self.llm.warm_prefix, self._system_prompt + "\n\n")
+            print(f"[Agent] MCP session ready, available tools: {[t.name for t in self._tools]}")
+            return self._session
+
+    async def _close_session(self):
+        if self._session_task is not None and not self._session_task.done():
+            self._session_closing.set()
+            await asyncio.gather(self._session_task, return_exceptions=True)
+        self._session = None
+        self._session_task = None
+
+    async def close(self):
+        """Close the MCP session, the history writer and the inference workers (on application shutdown)."""
+        async with self._session_lock:
+            await self._close_session()
+        await self._history.close()
+        self._inference.shutdown(wait=False, cancel_futures=True)
+
+    def _in_executor(self, function, *args):
+        """Run a blocking model call on the inference workers."""
+        return asyncio.get_running_loop().run_in_executor(self._inference, partial(function, *args))
+
+    def _save_to_history(self, response: str, history_type: str, run_id: str | None = None, iteration: int | None = None):
+        """Queue an agent interaction for the database history (not local_history), written in the background."""
+        self._history.record(response, history_type, run_id, iteration)
 
     def _clean_response(self, text: str) -> str:
         """Remove TOOL_CALL lines from response text."""
@@ -60,9 +205,10 @@ class RetailInventoryAgent:
         cleaned = re.sub(r'\n\s*\n+', '\n\n', cleaned)
         return cleaned.strip()
 
-    async def run_with_tools(self, user_query: str) -> str:
-        """Run the agent with access to MCP tools."""
-        print(f"\n[Agent] User query: {user_query}")
+    async def run_with_tools(self, user_query: str, events: AgentEventStream | None = None) -> str:
+        """Run the agent with access to MCP tools, publishing tokens and tool calls to `events` if given."""
+        run_id = uuid.uuid4().hex
+        print(f"\n[Agent] User query (run {run_id}): {user_query}")
 
         local_history: List[dict] = []
 
@@ -73,11 +219,6 @@ class RetailInventoryAgent:
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
 
-        server_params = StdioServerParameters(
-            command="python",
-            args=["mcp/server.py"],
-        )
-
         if local_history:
             print(f"[Agent] Conversation history ({len(local_history)} items):")
             for idx, item in enumerate(local_history):
@@ -88,177 +229,364 @@ class RetailInventoryAgent:
         else:
             print("[Agent] No conversation history")
 
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-
-                tools_response = await session.list_tools()
-                available_tools = [t.name for t in tools_response.tools]
-
-                print(f"[Agent] Available tools: {available_tools}")
-
-                system_prompt = self._build_system_prompt(tools_response.tools)
-
-                # Track all tool results for context
-                tool_results_context = []
-
-                # Allow up to 5 tool calls in a chain
-                max_iterations = 20
-                current_iteration = 0
-                current_response = None
-
-                while current_iteration < max_iterations:
-                    # Build prompt with history and tool results
-                    if current_iteration == 0:
-                        # First iteration: merge system prompt with user query for better reasoning
-                        full_prompt = f"""{system_prompt}
-
-Task: {user_query}
-
-What is the FIRST step? Call ONE tool.
-Assistant:"""
-                    else:
-                        # Add tool results to prompt
-                        full_prompt = self._build_prompt_with_history(system_prompt, local_history, user_query)
-
-                        # Build a clear summary of completed actions
-                        if tool_results_context:
-                            full_prompt += "\n\n=== ACTIONS COMPLETED SO FAR ===\n"
-                            action_num = 1
-                            for ctx in tool_results_context:
-                                if ctx['name'] == 'reasoning':
-                                    continue
-                                full_prompt += f"{action_num}. Called {ctx['name']}"
-                                if 'args' in ctx:
-                                    full_prompt += f" with {ctx['args']}"
-                                full_prompt += f"\n   Result: {ctx['result']}\n"
-                                action_num += 1
-                            full_prompt += "=== END OF COMPLETED ACTIONS ===\n"
-
-                            full_prompt += "\n\nIMPORTANT: Review the actions above. Do NOT repeat them. What is the NEXT NEW action needed, or say [DONE] if everything is complete?\n\nAssistant:"
-
-                        print(f"[Agent] Generating response (iteration {current_iteration + 1})...)")
-                    response = self.llm(
-                        full_prompt,
-                        max_tokens=1024,
-                        temperature=0.5,
-                        stop=["[DONE]", "\n\n\n"],
-                    )
+        session = await self._get_session()
+        system_prompt = self._system_prompt
 
-                    current_response = response['choices'][0]['text'].strip()
-
-                    # Empty response when ai stop generating
-                    if not current_response:
-                        print("[Agent] Empty response, stopping process...")
-                        break
-
-                    print(f"[Agent] LLM Response: {current_response}")
-
-                    # Parse all tool calls from the response FIRST
-                    tool_calls = self._parse_tool_calls(current_response)
-
-                    # Check if agent signaled completion (only after checking for tool calls)
-                    if "[DONE]" in current_response:
-                        # If there are tool calls, execute them first before marking as done
-                        if tool_calls:
-                            print(f"[Agent] {len(tool_calls)} tool call(s) detected (with [DONE])")
-                        else:
-                            print("[Agent] Agent signaled completion with [DONE]")
-                            final_response = self._clean_response(current_response)
-                            await self._save_to_history(final_response, "answer")
-
-                            # Save to local history
-                            current_exchange["response"] = final_response
-                            local_history.append(current_exchange)
-
-                            return final_response
-
-                    # If no tool calls and no [DONE], continue to next iteration for more reasoning
-                    if not tool_calls:
-                        print("[Agent] No tool calls detected, continuing reasoning...")
-                        tool_results_context.append({
-                            "name": "reasoning",
-                            "result": current_response
-                        })
-                        current_iteration += 1
-
-                    # Save the explanation to history BEFORE executing tools
-                    explanation = self._clean_response(current_response)
-                    if explanation:  # Only save if there's actual text after cleaning
-                        await self._save_to_history(explanation, "answer")
-
-                    # Execute all tool calls
-                    print(f"[Agent] {len(tool_calls)} tool call(s) detected")
-
-                    # Build a set of already executed tool calls in this iteration
-                    executed_in_iteration = set()
-                    for ctx in tool_results_context:
-                        if ctx['name'] != 'reasoning' and 'args' in ctx:
-                            call_signature = (ctx['name'], json.dumps(ctx['args'], sort_keys=True))
-                            executed_in_iteration.add(call_signature)
-
-                    for idx, tool_call in enumerate(tool_calls):
-                        print(f"[Agent] Tool call {idx + 1}/{len(tool_calls)}: {tool_call}")
-                        tool_name = tool_call['name']
-                        tool_args = tool_call['arguments']
-
-                        # Check if this exact call was already made in this iteration
-                        call_signature = (tool_name, json.dumps(tool_args, sort_keys=True))
-                        if call_signature in executed_in_iteration:
-                            print(f"[Agent] ⚠️  DUPLICATE DETECTED: {tool_name} with same args already called in this iteration. Stopping.")
-                            continue
-
-                        print(f"[Agent] Calling tool {tool_name} with args {tool_args}")
-                        result = await session.call_tool(tool_name, arguments=tool_args)
-
-                        # Parse the MCP result
-                        if result.content:
-                            combined_results = []
-                            for content_item in result.content:
-                                if hasattr(content_item, 'text'):
-                                    try:
-                                        combined_results.append(json.loads(content_item.text))
-                                    except:
-                                        pass
-                            result_text = json.dumps(combined_results, indent=2)
-                        else:
-                            result_text = str(result)
-
-                        print(f"[Agent] Tool result (parsed): {result_text[:200]}...")
-
-                        # Add to context with args for duplicate detection
-                        tool_results_context.append({
-                            "name": tool_name,
-                            "result": result_text,
-                            "args": tool_args
-                        })
-
-                        # Mark this call as executed
-                        executed_in_iteration.add(call_signature)
-
-                    # Check if this was the final iteration (had [DONE])
-                    if "[DONE]" in current_response:
-                        print("[Agent] Agent signaled completion with [DONE] after tool execution")
-                        # Don't save again - already saved before tool execution
-
-                        # Save to local history
-                        current_exchange["response"] = explanation
-                        local_history.append(current_exchange)
-
-                        return explanation
-
-                    current_iteration += 1
-
-                if current_iteration >= max_iterations:
-                    print("[Agent] Max iterations reached")
+        # Track all tool results for context
+        tool_results_context = []
+        # Prompt pieces built once, kept within the token budget
+        context = PromptContext(
+            self._build_prompt_with_history(system_prompt, local_history, user_query),
+            count_tokens=self._count_tokens
+        )
 
-                final_response = self._clean_response(current_response) if current_response else "No response generated."
+        # Allow up to 5 tool calls in a chain
+        max_iterations = 20
+        current_iteration = 0
+        current_response = None
+
+        while current_iteration < max_iterations:
+            # Build prompt with history and tool results
+            if current_iteration == 0:
+                # First iteration: same prefix as the next ones (system prompt + task), so the
+                # local model reuses its evaluated state and only prefills the new actions
+                full_prompt = context.prompt("\nWhat is the FIRST step? Call ONE tool.\nAssistant:")
+            else:
+                # Add the completed actions (tool results) to the prompt
+                trailer = ""
+                if context.actions:
+                    trailer = "\n\nIMPORTANT: Review the actions above. Do NOT repeat them. What is the NEXT NEW action needed, or say [DONE] if everything is complete?\n\nAssistant:"
+                full_prompt = context.prompt(trailer)
+
+                print(f"[Agent] Generating response (iteration {current_iteration + 1})...)")
+            context.report(current_iteration + 1)
+            on_token = (lambda text: events.emit("token", text=text)) if events else None
+            current_response, tool_calls, done = await self._infer(full_prompt, on_token)
+
+            # Empty response when ai stop generating
+            if not current_response and not tool_calls:
+                print("[Agent] Empty response, stopping process...")
+                break
+
+            print(f"[Agent] LLM Response: {current_response}")
+
+            # Check if agent signaled completion (only after checking for tool calls)
+            if done:
+                # If there are tool calls, execute them first before marking as done
+                if tool_calls:
+                    print(f"[Agent] {len(tool_calls)} tool call(s) detected (with [DONE])")
+                else:
+                    print("[Agent] Agent signaled completion with [DONE]")
+                    final_response = self._clean_response(current_response)
+                    self._save_to_history(final_response, "answer", run_id, current_iteration + 1)
+
+                    # Save to local history
+                    current_exchange["response"] = final_response
+                    local_history.append(current_exchange)
+
+                    return final_response
+
+            # If no tool calls and no [DONE], continue to next iteration for more reasoning
+            if not tool_calls:
+                print("[Agent] No tool calls detected, continuing reasoning...")
+                tool_results_context.append({
+                    "name": "reasoning",
+                    "result": current_response
+                })
+                current_iteration += 1
+
+            # Save the explanation to history BEFORE executing tools
+            explanation = self._clean_response(current_response)
+            if explanation:  # Only save if there's actual text after cleaning
+                self._save_to_history(explanation, "answer", run_id, current_iteration + 1)
+
+            # Execute all tool calls
+            print(f"[Agent] {len(tool_calls)} tool call(s) detected")
+
+            # Build a set of already executed tool calls in this iteration
+            executed_in_iteration = set()
+            for ctx in tool_results_context:
+                if ctx['name'] != 'reasoning' and 'args' in ctx:
+                    call_signature = (ctx['name'], json.dumps(ctx['args'], sort_keys=True))
+                    executed_in_iteration.add(call_signature)
+
+            pending_calls = []
+            for idx, tool_call in enumerate(tool_calls):
+                print(f"[Agent] Tool call {idx + 1}/{len(tool_calls)}: {tool_call}")
+                tool_name = tool_call['name']
+                tool_args = tool_call['arguments']
+
+                # Check if this exact call was already made in this iteration
+                call_signature = (tool_name, json.dumps(tool_args, sort_keys=True))
+                if call_signature in executed_in_iteration:
+                    print(f"[Agent] ⚠️  DUPLICATE DETECTED: {tool_name} with same args already called in this iteration. Stopping.")
+                    continue
+
+                # Mark this call as executed
+                executed_in_iteration.add(call_signature)
+                pending_calls.append(tool_call)
+
+            # Independent calls run concurrently, batches run in order
+            for batch in self._plan_tool_batches(pending_calls):
+                if len(batch) > 1:
+                    print(f"[Agent] Running {len(batch)} tool calls concurrently: {[call['name'] for call in batch]}")
+                results = await asyncio.gather(*(self._run_tool_call(session, call, events) for call in batch))
+                for tool_call, result_text in zip(batch, results):
+                    # Add to context with args for duplicate detection
+                    tool_results_context.append({
+                        "name": tool_call['name'],
+                        "result": result_text,
+                        "args": tool_call['arguments']
+                    })
+                    context.add_action(tool_call['name'], tool_call['arguments'], result_text)
+
+            # Check if this was the final iteration (had [DONE])
+            if done:
+                print("[Agent] Agent signaled completion with [DONE] after tool execution")
+                # Don't save again - already saved before tool execution
 
                 # Save to local history
-                current_exchange["response"] = final_response
+                current_exchange["response"] = explanation
                 local_history.append(current_exchange)
 
-                return final_response
+                return explanation
+
+            current_iteration += 1
+
+        if current_iteration >= max_iterations:
+            print("[Agent] Max iterations reached")
+
+        final_response = self._clean_response(current_response) if current_response else "No response generated."
+
+        # Save to local history
+        current_exchange["response"] = final_response
+        local_history.append(current_exchange)
+
+        return final_response
+
+    def _plan_tool_batches(self, tool_calls: List[Dict]) -> List[List[Dict]]:
+        """
+        Split the tool calls of a response into batches run one after the other (calls of a
+        batch run concurrently). Consecutive read-only calls share a batch; consecutive
+        mutating calls share a batch when they touch different SKUs or orders. Switching
+        between reads and writes starts a new batch, so calls that may depend on each other
+        keep their order.
+        """
+        batches = []
+        batch_read_only = None
+        batch_resources = set()
+        for tool_call in tool_calls:
+            read_only = tool_call['name'] in self._read_only_tools
+            resources = self._tool_call_resources(tool_call['arguments'])
+            same_batch = (
+                batches
+                and read_only == batch_read_only
+                # A write without a known resource (or on a resource already written) waits for the batch
+                and (read_only or (resources and batch_resources is not None and not resources & batch_resources))
+            )
+            if not same_batch:
+                batches.append([])
+                batch_read_only = read_only
+                batch_resources = set()
+            batches[-1].append(tool_call)
+            if not read_only:
+                # None: the batch holds a write on an unknown resource, nothing may join it
+                batch_resources = batch_resources | resources if resources and batch_resources is not None else None
+        return batches
+
+    def _tool_call_resources(self, arguments: Dict) -> set:
+        """SKUs and order IDs a tool call touches."""
+        resources = set()
+        if arguments.get("sku"):
+            resources.add(("sku", str(arguments["sku"]).strip()))
+        if arguments.get("order_id"):
+            resources.add(("order", str(arguments["order_id"]).strip()))
+        for item in arguments.get("items") or []:
+            if isinstance(item, dict) and item.get("sku"):
+                resources.add(("sku", str(item["sku"]).strip()))
+        return resources
+
+    async def _run_tool_call(self, session: ClientSession, tool_call: Dict, events: AgentEventStream | None = None) -> str:
+        """Call a tool (bounded by TOOL_CALL_CONCURRENCY) and render its result for the prompt."""
+        tool_name = tool_call['name']
+        tool_args = tool_call['arguments']
+        async with self._tool_slots:
+            print(f"[Agent] Calling tool {tool_name} with args {tool_args}")
+            if events:
+                events.emit("tool_start", name=tool_name, arguments=tool_args)
+            started = time.perf_counter()
+            try:
+                result = await session.call_tool(tool_name, arguments=tool_args)
+            except Exception:
+                # Check the session before the next query
+                self._last_health_check = 0.0
+                raise
+        if result.meta:
+            print(f"[Agent] Tool metadata: {result.meta}")
+
+        # Parse the MCP result
+        if result.content:
+            combined_results = []
+            for content_item in result.content:
+                if hasattr(content_item, 'text'):
+                    try:
+                        combined_results.append(json.loads(content_item.text))
+                    except:
+                        pass
+            result_text = self._render_tool_result(combined_results)
+        else:
+            result_text = str(result)
+
+        print(f"[Agent] Tool result (parsed): {result_text[:200]}...")
+        if events:
+            events.emit(
+                "tool_end",
+                name=tool_name,
+                result=result_text,
+                error=bool(result.isError),
+                duration=round(time.perf_counter() - started, 3)
+            )
+        return result_text
+
+    async def _infer(self, prompt: str, on_token=None) -> tuple[str, List[Dict], bool]:
+        """
+        Run _generate on the inference workers, so the event loop keeps serving requests and
+        tool calls of other runs. When the run is cancelled, an interruptible backend stops at its next token.
+        """
+        cancelled = threading.Event()
+
+        def emit(text: str):
+            if cancelled.is_set():
+                raise InferenceCancelled()
+            if on_token:
+                on_token(text)
+
+        try:
+            return await self._in_executor(self._generate, prompt, emit if on_token or self.llm.interruptible else None)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    def _generate(self, prompt: str, on_token=None) -> tuple[str, List[Dict], bool]:
+        """Ask the model for the next step: (explanation, tool calls, done). Text is passed to `on_token` as it is generated."""
+        if self._tool_call_mode == "grammar":
+            text, _ = self.llm.generate(prompt, max_tokens=1024, temperature=0.5, grammar=self._grammar, on_token=on_token)
+            try:
+                return structured.parse_response(text)
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"[Agent] Invalid structured response ({e}), parsing it as text")
+                return text.strip(), self._parse_tool_calls(text), "[DONE]" in text
+
+        if self._tool_call_mode == "native":
+            text, tool_calls = self.llm.generate(
+                prompt,
+                max_tokens=1024,
+                temperature=0.5,
+                functions=self._function_declarations,
+                on_token=on_token
+            )
+            # Without function calls the model is giving its final answer
+            return text.strip(), tool_calls, not tool_calls
+
+        text, _ = self.llm.generate(prompt, max_tokens=1024, temperature=0.5, stop=["[DONE]", "\n\n\n"], on_token=on_token)
+        text = text.strip()
+        return text, self._parse_tool_calls(text), "[DONE]" in text
+
+    async def restock(self, mode: RestockMode = RESTOCK_MODE, days: int = RESTOCK_DAYS, summarize: bool = RESTOCK_SUMMARY) -> str:
+        """Run the routine restock with the deterministic planner or through the LLM (mode="llm"), timing both."""
+        if mode not in get_args(RestockMode):
+            raise ValueError(f"Unknown restock mode: {mode!r} (expected one of {', '.join(get_args(RestockMode))})")
+        started = time.perf_counter()
+        if mode == "llm":
+            response = await self.run_with_tools(RESTOCK_QUERY)
+        else:
+            response = await self._plan_restock(days, summarize)
+        print(f"[Agent] Restock ({mode}) completed in {time.perf_counter() - started:.3f}s")
+        return response
+
+    async def _plan_restock(self, days: int, summarize: bool) -> str:
+        """
+        Deterministic restock: order the recommended quantity (backend forecast, covers
+        RESTOCK_COVER_DAYS) of every product that runs out within `days` days, in one bulk order.
+        """
+        run_id = uuid.uuid4().hex
+        session = await self._get_session()
+        at_risk = await self._call_tool_json(session, "soon_out_of_stock_products", {"days": days, "output": "json"})
+        if at_risk and "error" in at_risk[0]:
+            response = f"Could not get the products to restock: {at_risk[0]['error']}"
+            self._save_to_history(response, "answer", run_id)
+            return response
+
+        items = [
+            {"sku": row["sku"], "quantity": row["recommended_order_quantity"]}
+            for row in at_risk
+            if row["recommended_order_quantity"] > 0
+        ]
+        if not items:
+            response = f"No products will run out of stock in the next {days} days."
+            self._save_to_history(response, "answer", run_id)
+            return response
+
+        ordered = await self._call_tool_json(session, "order_products", {"items": items})
+        if ordered and "error" in ordered[0]:
+            response = f"Restock orders failed: {ordered[0]['error']}"
+        else:
+            lines = [
+                f"- {row['sku']}: {row['current_stock']} in stock, ~{row['days_until_out_of_stock']:g} days left, ordered {row['recommended_order_quantity']}"
+                for row in at_risk
+                if row["recommended_order_quantity"] > 0
+            ]
+            response = f"Restocked {len(items)} products running out in the next {days} days:\n" + "\n".join(lines)
+            if summarize:
+                summary = await self._in_executor(
+                    self.llm.complete,
+                    f"Summarize this restock for a store manager in 2-3 sentences.\n\n{response}\n\nAssistant:",
+                    256,
+                    0.2
+                )
+                response = summary or response
+
+        self._save_to_history(response, "answer", run_id)
+        return response
+
+    async def _call_tool_json(self, session: ClientSession, name: str, arguments: Dict) -> List:
+        """
+        Call a tool and parse its JSON content items (one per list element). A tool error,
+        or a content item that is not JSON, is returned as [{"error": text}].
+        """
+        result = await session.call_tool(name, arguments=arguments)
+        texts = [content_item.text for content_item in result.content if hasattr(content_item, 'text')]
+        if result.isError:
+            return [{"error": "\n".join(texts) or f"{name} failed"}]
+        parsed = []
+        for text in texts:
+            try:
+                parsed.append(json.loads(text))
+            except json.JSONDecodeError:
+                return [{"error": text}]
+        return parsed
+
+    def _render_tool_result(self, results: List) -> str:
+        """Render parsed tool results for the prompt, keeping tabular pages as raw TSV."""
+        if len(results) == 1 and isinstance(results[0], dict) and "table" in results[0]:
+            page = results[0]
+            header = f"(page {page['page']}/{page['pages']}, {page['total_rows']} rows, ~{page['token_estimate']} tokens"
+            if page.get("next_page"):
+                header += f", more with page={page['next_page']}"
+            return f"{header})\n{page['table']}"
+        # Compact JSON without empty fields: every result stays in the prompt of the next iterations
+        return json.dumps(self._drop_empty_fields(results), separators=(",", ":"), ensure_ascii=False, default=str)
+
+    def _drop_empty_fields(self, value):
+        if isinstance(value, dict):
+            return {key: self._drop_empty_fields(item) for key, item in value.items() if item is not None and item != ""}
+        if isinstance(value, list):
+            return [self._drop_empty_fields(item) for item in value]
+        return value
+
+    def _count_tokens(self, text: str) -> int:
+        """Exact count with the local tokenizer, estimate (4 characters per token) for the other backends."""
+        return self.llm.count_tokens(text)
 
     def _build_prompt_with_history(self, system_prompt: str, history: List[Dict], current_query: str) -> str:
         """Construire le prompt avec l'historique."""
@@ -279,30 +607,47 @@ Assistant:"""
             for tool in tools
         ])
 
-        return f"""You are a retail inventory assistant. Available tools:
-
-{tools_desc}
+        if self._tool_call_mode == "grammar":
+            call_format = structured.RESPONSE_FORMAT + """
 
-RULES:
-1. NEVER make up SKU values - use actual data from tools
-2. NEVER call the same tool twice with the same arguments
-3. Call ONE information tool at a time to gather data
-4. You CAN call order_product multiple times in ONE response
-5. Brief explanation before tool calls
-6. Say [DONE] when complete
+EXAMPLE:
+{"explanation": "Checking products needing restock.", "tool_calls": [{"name": "soon_out_of_stock_products", "arguments": {"days": 5}}], "done": false}
+(Gets SKU-0018 qty 166, SKU-0023 qty 90)
+{"explanation": "Placing orders for SKU-0018 and SKU-0023.", "tool_calls": [{"name": "order_products", "arguments": {"items": [{"sku": "SKU-0018", "quantity": 166}, {"sku": "SKU-0023", "quantity": 90}]}}], "done": false}
+{"explanation": "Ordered 166 x SKU-0018 and 90 x SKU-0023.", "tool_calls": [], "done": true}
+"""
+        elif self._tool_call_mode == "native":
+            call_format = """Call the tools with function calls. When the task is complete, reply with the final answer and no function call.
+"""
+        else:
+            call_format = """Say [DONE] when complete.
 
 EXAMPLE:
 Checking products needing restock.
 TOOL_CALL: soon_out_of_stock_products(days=5)
 
-(Gets SKU-0018, qty 166)
+(Gets SKU-0018 qty 166, SKU-0023 qty 90)
 
-Placing order for SKU-0018.
-TOOL_CALL: order_product(sku="SKU-0018", quantity=166)
+Placing orders for SKU-0018 and SKU-0023.
+TOOL_CALL: order_products(items=[{"sku": "SKU-0018", "quantity": 166}, {"sku": "SKU-0023", "quantity": 90}])
 
 [DONE]
 """
 
+        return f"""You are a retail inventory assistant. Available tools:
+
+{tools_desc}
+
+RULES:
+1. NEVER make up SKU values - use actual data from tools
+2. NEVER call the same tool twice with the same arguments
+3. Call ONE information tool at a time to gather data
+4. To restock several products, call order_products ONCE with all of them
+5. Brief explanation before tool calls
+6. List results are tables (TSV); call the tool again with page=N only if you need more rows
+
+{call_format}"""
+
     def _parse_tool_calls(self, text: str) -> List[Dict]:
         """Parse multiple tool calls from LLM response."""
         tool_calls = []
@@ -317,9 +662,10 @@ TOOL_CALL: order_product(sku="SKU-0018", quantity=166)
             try:
                 tool_name = match.group(1).strip()
                 args_str = match.group(2).strip() if match.group(2) else ""
-                args = {}
+                args = self._parse_literal_arguments(args_str)
 
-                if args_str:
+                if args is None:
+                    args = {}
                     for arg in args_str.split(","):
                         if not arg.strip():
                             continue
@@ -358,6 +704,19 @@ TOOL_CALL: order_product(sku="SKU-0018", quantity=166)
 
         return tool_calls
 
+    def _parse_literal_arguments(self, args_str: str) -> Dict | None:
+        """Parse `key=value` arguments written as Python/JSON literals (lists, dicts, strings with commas)."""
+        try:
+            call = ast.parse(f"tool({args_str})", mode="eval").body
+            if call.args:
+                return None
+            return {
+                keyword.arg: ast.literal_eval(keyword.value)
+                for keyword in call.keywords
+            }
+        except (SyntaxError, ValueError):
+            return None
+
     def _parse_tool_call(self, text: str):
         """Parse tool call from LLM response (deprecated - use _parse_tool_calls)."""
         calls = self._parse_tool_calls(text)
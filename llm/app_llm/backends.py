@@ -0,0 +1,233 @@
+"""
+LLM backends of the agent.
+
+- llama: local llama.cpp model (KV-cache reuse, JSON schema grammar for tool calls)
+- gemini: hosted model (native function calling)
+- scripted: deterministic stub replaying canned responses with a configurable latency,
+  to benchmark and regression-test the agent loop (parsing, tool dispatch, prompt
+  building) without a network or a model
+
+Backends are blocking: the agent runs them on its inference workers.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+from app_llm.local_llm import LocalLlama
+
+# "llama", "gemini" or "scripted"
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+# Threads running model inference off the event loop (llama.cpp releases the GIL while it
+# computes). Each local model worker loads its own copy of the model, as a llama.cpp context
+# cannot be shared between threads.
+LLM_INFERENCE_WORKERS = int(os.getenv("LLM_INFERENCE_WORKERS", "1" if LLM_BACKEND == "llama" else "4"))
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "models/gemini-2.5-flash-lite")
+# Scripted stub: JSON file with the list of responses (built-in restock script by default),
+# seconds before the first token and between two tokens
+SCRIPTED_RESPONSES = os.getenv("SCRIPTED_RESPONSES")
+SCRIPTED_LATENCY = float(os.getenv("SCRIPTED_LATENCY", "0"))
+SCRIPTED_TOKEN_LATENCY = float(os.getenv("SCRIPTED_TOKEN_LATENCY", "0"))
+
+DEFAULT_SCRIPT = [
+    {
+        "explanation": "Checking the products that will run out of stock in the next 7 days.",
+        "tool_calls": [{"name": "soon_out_of_stock_products", "arguments": {"days": 7}}],
+        "done": False,
+    },
+    {
+        "explanation": "The products running out of stock have been reviewed.",
+        "tool_calls": [],
+        "done": True,
+    },
+]
+
+
+class LLMBackend(ABC):
+    """
+    Interface of the agent models. generate() returns the generated text and the native
+    tool calls ({"name", "arguments"}, only with supports_functions), and passes each
+    piece of text to `on_token` as it is generated.
+    """
+    name = ""
+    # JSON schema constrained completions (grammar mode tool calls)
+    supports_grammar = False
+    # Native function calling (function declarations)
+    supports_functions = False
+    # Generation stops when `on_token` raises (cancelled runs)
+    interruptible = False
+    workers = LLM_INFERENCE_WORKERS
+
+    @abstractmethod
+    def generate(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        stop: List[str] | None = None,
+        grammar=None,
+        functions: List[Dict] | None = None,
+        on_token: Callable[[str], None] | None = None,
+    ) -> tuple[str, List[Dict]]:
+        ...
+
+    def complete(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        """Plain text completion, without tools."""
+        text, _ = self.generate(prompt, max_tokens, temperature)
+        return text.strip()
+
+    def count_tokens(self, text: str) -> int:
+        """Estimate (4 characters per token) when the tokenizer is not available."""
+        return len(text) // 4 + 1
+
+    def grammar(self, schema: Dict):
+        """Compile the JSON schema of an agent step (supports_grammar only)."""
+        return schema
+
+    def warm_prefix(self, prefix: str):
+        """Prepare a prompt prefix shared by every prompt (the system prompt)."""
+
+
+class LlamaBackend(LLMBackend):
+    """Local llama.cpp model, one copy per inference worker."""
+    name = "llama"
+    supports_grammar = True
+    interruptible = True
+
+    def __init__(self, model_path: str, workers: int = LLM_INFERENCE_WORKERS):
+        print(f"[LLM] Loading model from {model_path} ({workers} workers)")
+        self.workers = workers
+        self._models: queue.Queue = queue.Queue()
+        for _ in range(workers):
+            self._models.put(LocalLlama(model_path))
+        # Used for tokenization and grammars only
+        self._tokenizer = self._models.queue[0]
+
+    @contextmanager
+    def _model(self):
+        """Check out a model copy for the calling inference worker."""
+        llm = self._models.get()
+        try:
+            yield llm
+        finally:
+            self._models.put(llm)
+
+    def generate(self, prompt, max_tokens, temperature, stop=None, grammar=None, functions=None, on_token=None):
+        with self._model() as llm:
+            response = llm(prompt, max_tokens=max_tokens, temperature=temperature, stop=stop, grammar=grammar, on_token=on_token)
+        return response['choices'][0]['text'], []
+
+    def count_tokens(self, text: str) -> int:
+        return self._tokenizer.count_tokens(text)
+
+    def grammar(self, schema: Dict):
+        return self._tokenizer.grammar(schema)
+
+    def warm_prefix(self, prefix: str):
+        """Evaluate the prefix on every model copy."""
+        models = [self._models.get() for _ in range(self.workers)]
+        try:
+            for llm in models:
+                llm.warm_prefix(prefix)
+        finally:
+            for llm in models:
+                self._models.put(llm)
+
+
+class GeminiBackend(LLMBackend):
+    """Hosted model, API key in GEMINI_API_KEY (environment or .env file)."""
+    name = "gemini"
+    supports_functions = True
+
+    def __init__(self, model_name: str = GEMINI_MODEL):
+        import google.generativeai as genai
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY is not set")
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt, max_tokens, temperature, stop=None, grammar=None, functions=None, on_token=None):
+        generation_config = {"max_output_tokens": max_tokens, "temperature": temperature}
+        if stop:
+            generation_config["stop_sequences"] = stop
+        response = self.model.generate_content(
+            prompt,
+            tools=[{"function_declarations": functions}] if functions else None,
+            generation_config=generation_config,
+            stream=on_token is not None,
+        )
+        text_parts, tool_calls = [], []
+        for chunk in (response if on_token else [response]):
+            for part in chunk.candidates[0].content.parts:
+                if part.function_call.name:
+                    call = type(part.function_call).to_dict(part.function_call)
+                    tool_calls.append({"name": call["name"], "arguments": call.get("args") or {}})
+                elif part.text:
+                    text_parts.append(part.text)
+                    if on_token:
+                        on_token(part.text)
+        return "".join(text_parts), tool_calls
+
+
+class ScriptedBackend(LLMBackend):
+    """
+    Replays canned responses in order, starting over after the last one. A response is
+    either a string, returned as is, or an agent step {"explanation", "tool_calls", "done"},
+    rendered as JSON in grammar mode and as TOOL_CALL lines otherwise.
+    """
+    name = "scripted"
+    supports_grammar = True
+    interruptible = True
+
+    def __init__(self, responses: List | None = None, latency: float = SCRIPTED_LATENCY, token_latency: float = SCRIPTED_TOKEN_LATENCY):
+        if responses is None and SCRIPTED_RESPONSES:
+            with open(SCRIPTED_RESPONSES) as f:
+                responses = json.load(f)
+        self.responses = responses or DEFAULT_SCRIPT
+        self.latency = latency
+        self.token_latency = token_latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, max_tokens, temperature, stop=None, grammar=None, functions=None, on_token=None):
+        with self._lock:
+            response = self.responses[self.calls % len(self.responses)]
+            self.calls += 1
+        text = response if isinstance(response, str) else self._render(response, structured=grammar is not None)
+
+        time.sleep(self.latency)
+        for index, piece in enumerate(text.split(" ")):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            if on_token:
+                on_token(piece if index == 0 else " " + piece)
+        return text, []
+
+    def _render(self, step: Dict, structured: bool) -> str:
+        if structured:
+            return json.dumps(step)
+        lines = [step.get("explanation", "")]
+        for call in step.get("tool_calls", []):
+            arguments = ", ".join(f"{key}={value!r}" for key, value in call.get("arguments", {}).items())
+            lines.append(f"TOOL_CALL: {call['name']}({arguments})")
+        if step.get("done"):
+            lines.append("[DONE]")
+        return "\n".join(lines)
+
+
+def create_backend(name: str = LLM_BACKEND, model_path: str | None = None) -> LLMBackend:
+    if name == "llama":
+        return LlamaBackend(model_path)
+    if name == "gemini":
+        return GeminiBackend()
+    if name == "scripted":
+        return ScriptedBackend()
+    raise ValueError(f"Unknown LLM backend: {name}")
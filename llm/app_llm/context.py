@@ -0,0 +1,90 @@
+"""
+Token budget of the agent prompt.
+
+The prompt is built from pieces rendered (and counted) once: the prefix (system
+prompt, history, task), then one block per completed action. When the total goes
+over the budget, the results of the oldest actions are compacted to a one-line
+preview, then dropped. The call itself (tool and arguments) always stays, so the
+model does not repeat it. Compacting changes the prompt prefix from that action on,
+so the local model re-evaluates from there: it only happens over budget.
+"""
+import os
+from typing import Callable, Dict, List
+
+CONTEXT_BUDGET_TOKENS = int(os.getenv("CONTEXT_BUDGET_TOKENS", "7000"))
+# Latest action results always kept in full
+CONTEXT_RECENT_RESULTS = int(os.getenv("CONTEXT_RECENT_RESULTS", "2"))
+COMPACT_RESULT_CHARS = 200
+
+ACTIONS_HEADER = "\n\n=== ACTIONS COMPLETED SO FAR ===\n"
+ACTIONS_FOOTER = "=== END OF COMPLETED ACTIONS ===\n"
+
+
+class ActionBlock:
+    def __init__(self, number: int, name: str, args: Dict, result: str):
+        self.call = f"{number}. Called {name} with {args}\n"
+        self.result = result
+        self.level = "full"
+
+    def render(self) -> str:
+        if self.level == "full":
+            return f"{self.call}   Result: {self.result}\n"
+        if self.level == "compact":
+            lines = self.result.splitlines()
+            preview = " ".join(line.strip() for line in lines)[:COMPACT_RESULT_CHARS]
+            return f"{self.call}   Result (truncated, {len(lines)} lines): {preview}...\n"
+        return f"{self.call}   Result: omitted\n"
+
+
+class PromptContext:
+    """Builds the prompt of each iteration within CONTEXT_BUDGET_TOKENS and reports its size."""
+
+    def __init__(self, prefix: str, count_tokens: Callable[[str], int], budget: int = CONTEXT_BUDGET_TOKENS):
+        self.prefix = prefix
+        self.count_tokens = count_tokens
+        self.budget = budget
+        self.prefix_tokens = count_tokens(prefix)
+        self.frame_tokens = count_tokens(ACTIONS_HEADER + ACTIONS_FOOTER)
+        self.actions: List[ActionBlock] = []
+        self._rendered: List[str] = []
+        self._tokens: List[int] = []
+
+    def add_action(self, name: str, args: Dict, result: str):
+        action = ActionBlock(len(self.actions) + 1, name, args, result)
+        self.actions.append(action)
+        self._rendered.append(action.render())
+        self._tokens.append(self.count_tokens(self._rendered[-1]))
+        self._fit()
+
+    def _fit(self):
+        """Compact, then drop, the oldest results until the prompt fits in the budget."""
+        older = range(max(len(self.actions) - CONTEXT_RECENT_RESULTS, 0))
+        for level in ("compact", "omitted"):
+            for index in older:
+                if self.tokens() <= self.budget:
+                    return
+                action = self.actions[index]
+                if action.level == "omitted" or (level == "compact" and action.level == "compact"):
+                    continue
+                action.level = level
+                self._rendered[index] = action.render()
+                self._tokens[index] = self.count_tokens(self._rendered[index])
+
+    def tokens(self) -> int:
+        actions_tokens = sum(self._tokens) + self.frame_tokens if self.actions else 0
+        return self.prefix_tokens + actions_tokens
+
+    def prompt(self, trailer: str) -> str:
+        parts = [self.prefix]
+        if self.actions:
+            parts += [ACTIONS_HEADER, *self._rendered, ACTIONS_FOOTER]
+        parts.append(trailer)
+        return "".join(parts)
+
+    def report(self, iteration: int):
+        compacted = sum(action.level == "compact" for action in self.actions)
+        omitted = sum(action.level == "omitted" for action in self.actions)
+        print(
+            f"[Context] Iteration {iteration}: ~{self.tokens()} tokens / {self.budget} "
+            f"(prefix {self.prefix_tokens}, {len(self.actions)} actions, {compacted} compacted, {omitted} omitted)"
+        )
@@ -0,0 +1,24 @@
+"""
+Live events of an agent run (LLM tokens, tool calls, final answer), streamed to
+clients as Server-Sent Events.
+"""
+import asyncio
+import json
+
+
+class AgentEventStream:
+    """Queue of the events of one agent run. emit() can be called from any thread."""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def emit(self, event: str, **data):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (event, data))
+
+    async def next(self) -> tuple[str, dict]:
+        return await self.queue.get()
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,87 @@
+"""
+Background writer of the agent history.
+
+The agent loop only queues its entries (explanations, answers). A background task
+sends them in batches to POST /api/agent/bulk on a pooled HTTP client, so the loop
+never waits on history persistence. When the backend is slow or down, the bounded
+queue fills up and new entries are dropped (history is best effort).
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+from httpx import AsyncClient, Limits
+
+HISTORY_QUEUE_SIZE = int(os.getenv("HISTORY_QUEUE_SIZE", "1000"))
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "50"))
+# Entries of a batch are collected for at most this long after the first one
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "0.5"))
+
+
+class HistoryWriter:
+    """Queues agent history entries and writes them in batches in the background."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=HISTORY_QUEUE_SIZE)
+        self._client: AsyncClient | None = None
+        self._task: asyncio.Task | None = None
+        # Batch being collected or written, written again on close if interrupted
+        self._batch: list = []
+        self.dropped = 0
+
+    def record(self, response: str, history_type: str, run_id: str | None = None, iteration: int | None = None):
+        """Queue an entry without waiting; starts the writer on first use."""
+        if self._task is None:
+            self._client = AsyncClient(base_url=self.base_url, timeout=10.0, limits=Limits(max_connections=2))
+            self._task = asyncio.create_task(self._write_batches())
+        try:
+            self._queue.put_nowait({
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "response": response,
+                "type": history_type,
+                "run_id": run_id,
+                "iteration": iteration,
+            })
+        except asyncio.QueueFull:
+            self.dropped += 1
+            print(f"[History] Queue full, entry dropped ({self.dropped} dropped so far)")
+
+    async def close(self):
+        """Write the queued entries, then stop the writer."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        while self._batch or not self._queue.empty():
+            await self._write(self._take_batch(self._batch))
+            self._batch = []
+        await self._client.aclose()
+        self._task = None
+
+    async def _write_batches(self):
+        while True:
+            self._batch = [await self._queue.get()]
+            deadline = asyncio.get_running_loop().time() + HISTORY_FLUSH_INTERVAL
+            while len(self._batch) < HISTORY_BATCH_SIZE:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._write(self._take_batch(self._batch))
+            self._batch = []
+
+    def _take_batch(self, batch: list) -> list:
+        """Complete a batch with the entries already queued."""
+        while len(batch) < HISTORY_BATCH_SIZE and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _write(self, batch: list):
+        try:
+            response = await self._client.post("/agent/bulk", json=batch)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"[History] Error saving {len(batch)} entries to history: {e}")
@@ -0,0 +1,161 @@
+"""
+Agent job queue.
+
+Queries, restocks and simulations are queued and run by a fixed number of workers,
+so concurrent requests cannot start an unbounded number of agent loops. Each job
+has an ID to follow its status and result, and can be cancelled.
+"""
+import asyncio
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+# Agent runs executed at the same time
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", "2"))
+# Jobs waiting for a worker; further submissions are rejected
+AGENT_QUEUE_SIZE = int(os.getenv("AGENT_QUEUE_SIZE", "20"))
+# Finished jobs kept for GET /agent/jobs/{id}
+AGENT_JOB_HISTORY = int(os.getenv("AGENT_JOB_HISTORY", "100"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind: str, params: dict, run: Callable[[], Awaitable], dedup_key: str | None = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.run = run
+        self.dedup_key = dedup_key
+        self.status = QUEUED
+        self.result = None
+        self.error: str | None = None
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: datetime | None = None
+        self.finished_at: datetime | None = None
+        self.task: asyncio.Task | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobQueue:
+    """Bounded queue of agent jobs run by AGENT_WORKERS workers."""
+
+    def __init__(self, workers: int = AGENT_WORKERS, max_queued: int = AGENT_QUEUE_SIZE):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._worker_tasks: list[asyncio.Task] = []
+        self._stopping = False
+
+    def start(self):
+        self._stopping = False
+        self._worker_tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        self._stopping = True
+        for job in self._jobs.values():
+            if job.status in (QUEUED, RUNNING):
+                self.cancel(job.id)
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def submit(self, kind: str, params: dict, run: Callable[[], Awaitable], dedup_key: str | None = None) -> Job:
+        """
+        Queue a job. A job with the same dedup_key still waiting for a worker is returned
+        instead of queuing a duplicate. Raises QueueFullError when AGENT_QUEUE_SIZE jobs are waiting.
+        """
+        if dedup_key:
+            for job in self._jobs.values():
+                if job.dedup_key == dedup_key and job.status == QUEUED:
+                    return job
+        if self.queued() >= self.max_queued:
+            raise QueueFullError(f"{self.max_queued} agent jobs already queued")
+
+        job = Job(kind, params, run, dedup_key)
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job)
+        self._trim()
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def list(self) -> list[Job]:
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Job | None:
+        """Cancel a queued job, or stop a running one."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        if job.status == QUEUED:
+            self._finish(job, CANCELLED)
+        elif job.task:
+            job.task.cancel()
+        return job
+
+    def queued(self) -> int:
+        return sum(job.status == QUEUED for job in self._jobs.values())
+
+    def metrics(self) -> dict:
+        running = sum(job.status == RUNNING for job in self._jobs.values())
+        return {
+            "queue_depth": self.queued(),
+            "running": running,
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+        }
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            if job.status != QUEUED:
+                continue
+            job.status = RUNNING
+            job.started_at = datetime.now(timezone.utc)
+            job.task = asyncio.create_task(job.run())
+            try:
+                job.result = await job.task
+                self._finish(job, SUCCEEDED)
+            except asyncio.CancelledError:
+                self._finish(job, CANCELLED)
+                if self._stopping:
+                    raise
+            except Exception as e:
+                print(f"[Jobs] {job.kind} job {job.id} failed: {e}")
+                job.error = str(e)
+                self._finish(job, FAILED)
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished_at = datetime.now(timezone.utc)
+        job.run = None
+        print(f"[Jobs] {job.kind} job {job.id} {status}")
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond AGENT_JOB_HISTORY."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(len(finished) - AGENT_JOB_HISTORY, 0)]:
+            del self._jobs[job_id]
@@ -0,0 +1,97 @@
+"""
+Local llama.cpp model with KV-cache reuse.
+
+llama.cpp only prefills the tokens after the longest prefix shared with what it has
+already evaluated. The agent prompt is append-only (system prompt, task, then one
+block per completed action), so each iteration only prefills the new action.
+Evaluated states are also kept in a prompt cache (in RAM or on disk), keyed by
+token prefix: the system prompt prefix is evaluated once and reused by every run,
+even after another prompt has been evaluated in between or after a restart
+(disk cache).
+"""
+import json
+import os
+import time
+
+LLAMA_N_CTX = int(os.getenv("LLAMA_N_CTX", "8192"))
+LLAMA_N_THREADS = int(os.getenv("LLAMA_N_THREADS", "8"))
+# Prompt cache: "ram", "disk" (survives restarts) or "none"
+LLAMA_KV_CACHE = os.getenv("LLAMA_KV_CACHE", "disk")
+LLAMA_KV_CACHE_DIR = os.getenv("LLAMA_KV_CACHE_DIR", "/app/models/kv_cache")
+LLAMA_KV_CACHE_BYTES = int(os.getenv("LLAMA_KV_CACHE_BYTES", str(2 << 30)))
+
+
+class LocalLlama:
+    """llama_cpp.Llama with a prompt-prefix cache, called like Llama (returns a completion dict)."""
+
+    def __init__(self, model_path: str):
+        from llama_cpp import Llama, LlamaDiskCache, LlamaRAMCache
+
+        self.llm = Llama(
+            model_path=model_path,
+            n_ctx=LLAMA_N_CTX,
+            n_threads=LLAMA_N_THREADS,
+            n_gpu_layers=0,
+            verbose=False,
+        )
+        if LLAMA_KV_CACHE == "disk":
+            self.llm.set_cache(LlamaDiskCache(cache_dir=LLAMA_KV_CACHE_DIR, capacity_bytes=LLAMA_KV_CACHE_BYTES))
+        elif LLAMA_KV_CACHE == "ram":
+            self.llm.set_cache(LlamaRAMCache(capacity_bytes=LLAMA_KV_CACHE_BYTES))
+        self._longest_token_prefix = Llama.longest_token_prefix
+
+    def _tokenize(self, text: str) -> list[int]:
+        return self.llm.tokenize(text.encode("utf-8"))
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.llm.tokenize(text.encode("utf-8"), add_bos=False))
+
+    def grammar(self, schema: dict):
+        """Compile a JSON schema into a GBNF grammar constraining the completions."""
+        from llama_cpp import LlamaGrammar
+        return LlamaGrammar.from_json_schema(json.dumps(schema), verbose=False)
+
+    def warm_prefix(self, prefix: str):
+        """Evaluate a stable prompt prefix (the system prompt) once and store its state in the prompt cache."""
+        if self.llm.cache is None:
+            return
+        tokens = self._tokenize(prefix)
+        if tokens in self.llm.cache and self._longest_token_prefix(self.llm.cache[tokens].input_ids.tolist(), tokens) == len(tokens):
+            return
+        started = time.perf_counter()
+        self.llm.reset()
+        self.llm.eval(tokens)
+        self.llm.cache[tokens] = self.llm.save_state()
+        print(f"[LLM] Cached prompt prefix: {len(tokens)} tokens in {time.perf_counter() - started:.2f}s")
+
+    def __call__(self, prompt: str, on_token=None, **kwargs) -> dict:
+        """
+        Complete a prompt, streamed to measure the time to first token and to pass each
+        piece of text to `on_token`. Returns a Llama completion dict with a `timings` entry.
+        """
+        tokens = self._tokenize(prompt)
+        reused = self._longest_token_prefix(self.llm._input_ids.tolist(), tokens)
+
+        started = time.perf_counter()
+        first_token_at = None
+        text = ""
+        for chunk in self.llm(prompt, stream=True, **kwargs):
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            piece = chunk["choices"][0]["text"]
+            text += piece
+            if on_token and piece:
+                on_token(piece)
+        finished = time.perf_counter()
+
+        timings = {
+            "prompt_tokens": len(tokens),
+            "reused_tokens": reused,
+            "time_to_first_token": round((first_token_at or finished) - started, 3),
+            "total_time": round(finished - started, 3),
+        }
+        print(
+            f"[LLM] Prompt {timings['prompt_tokens']} tokens ({timings['reused_tokens']} already evaluated), "
+            f"first token after {timings['time_to_first_token']}s, done in {timings['total_time']}s"
+        )
+        return {"choices": [{"text": text}], "timings": timings}
@@ -0,0 +1,80 @@
+"""
+Structured tool calls built from the MCP tool schemas (list_tools).
+
+- Local llama.cpp model: the response is constrained by a JSON schema (compiled to a
+  GBNF grammar) where each tool call is {"name": <tool>, "arguments": <tool input schema>}.
+- Hosted model: the tools are declared for native function calling.
+"""
+import json
+from typing import Dict, List
+
+# Keywords kept in the hosted model function declarations (OpenAPI subset)
+FUNCTION_SCHEMA_KEYS = {"type", "description", "properties", "required", "items", "enum", "nullable", "format"}
+
+RESPONSE_FORMAT = """RESPONSE FORMAT (JSON only):
+{"explanation": "<brief explanation>", "tool_calls": [{"name": "<tool>", "arguments": {...}}], "done": false}
+Use an empty tool_calls list with "done": true and the final answer as explanation when the task is complete."""
+
+
+def response_schema(tools) -> Dict:
+    """JSON schema of an agent step: an explanation, the tool calls to run and a done flag."""
+    definitions = {}
+    calls = []
+    for tool in tools:
+        arguments = dict(tool.inputSchema)
+        definitions.update(arguments.pop("$defs", {}))
+        calls.append({
+            "type": "object",
+            "properties": {"name": {"const": tool.name}, "arguments": arguments},
+            "required": ["name", "arguments"],
+        })
+    return {
+        "type": "object",
+        "properties": {
+            "explanation": {"type": "string"},
+            "tool_calls": {"type": "array", "items": {"anyOf": calls}},
+            "done": {"type": "boolean"},
+        },
+        "required": ["explanation", "tool_calls", "done"],
+        "$defs": definitions,
+    }
+
+
+def parse_response(text: str) -> tuple[str, List[Dict], bool]:
+    """Parse a schema-constrained agent step into (explanation, tool calls, done)."""
+    step = json.loads(text)
+    tool_calls = [{"name": call["name"], "arguments": call.get("arguments") or {}} for call in step.get("tool_calls", [])]
+    return step.get("explanation", ""), tool_calls, bool(step.get("done"))
+
+
+def _function_schema(schema: Dict, definitions: Dict) -> Dict:
+    """Inline $ref, turn Optional (anyOf with null) into nullable and drop unsupported keywords."""
+    if "$ref" in schema:
+        schema = definitions[schema["$ref"].split("/")[-1]]
+    if "anyOf" in schema:
+        options = [option for option in schema["anyOf"] if option.get("type") != "null"]
+        nullable = len(options) < len(schema["anyOf"])
+        schema = {**options[0], **({"description": schema["description"]} if "description" in schema else {})}
+        if nullable:
+            schema["nullable"] = True
+
+    result = {key: value for key, value in schema.items() if key in FUNCTION_SCHEMA_KEYS}
+    if "type" in result:
+        result["type"] = result["type"].upper()
+    if "properties" in result:
+        result["properties"] = {name: _function_schema(value, definitions) for name, value in result["properties"].items()}
+    if "items" in result:
+        result["items"] = _function_schema(result["items"], definitions)
+    return result
+
+
+def function_declarations(tools) -> List[Dict]:
+    """Native function declarations of the MCP tools for the hosted model."""
+    return [
+        {
+            "name": tool.name,
+            "description": tool.description or "",
+            "parameters": _function_schema(tool.inputSchema, tool.inputSchema.get("$defs", {})),
+        }
+        for tool in tools
+    ]
@@ -1,7 +1,11 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List
-from app_llm.agent import RetailInventoryAgent
+from app_llm.agent import RetailInventoryAgent, RESTOCK_MODE, RestockMode
+from app_llm.backends import LLM_BACKEND
+from app_llm.events import AgentEventStream, format_sse
+from app_llm.jobs import FINISHED, JobQueue, QueueFullError
 import asyncio
 import os
 
@@ -11,27 +15,35 @@ agent = None
 
 history: List[dict] = []
 
+jobs = JobQueue()
+
+# The stream checks its job status this often while no event arrives
+STREAM_POLL_SECONDS = 1.0
+
 class QueryRequest(BaseModel):
     query: str
 
 class QueryResponse(BaseModel):
     response: str
+    job_id: str | None = None
 
 @app.on_event("startup")
 async def startup():
     global agent
     print("[Agent] Initializing agent...")
+    jobs.start()
 
     model_path = "/app/qwen2.5-7b-instruct-q4_k_m-00001-of-00002.gguf"
 
-    # Check if file exists and get size
-    if os.path.exists(model_path):
-        file_size = os.path.getsize(model_path)
-        print(f"[Agent] Model file found: {model_path}")
-        print(f"[Agent] Model file size: {file_size / (1024**3):.2f} GB")
-    else:
-        print(f"[Agent] ERROR: Model file not found at {model_path}")
-        return
+    # Check if file exists and get size (local model only)
+    if LLM_BACKEND == "llama":
+        if os.path.exists(model_path):
+            file_size = os.path.getsize(model_path)
+            print(f"[Agent] Model file found: {model_path}")
+            print(f"[Agent] Model file size: {file_size / (1024**3):.2f} GB")
+        else:
+            print(f"[Agent] ERROR: Model file not found at {model_path}")
+            return
 
     try:
         agent = RetailInventoryAgent(model_path)
@@ -41,42 +53,117 @@ async def startup():
         import traceback
         traceback.print_exc()
 
+@app.on_event("shutdown")
+async def shutdown():
+    await jobs.stop()
+    if agent is not None:
+        await agent.close()
+
+def submit_job(kind: str, params: dict, run, dedup_key: str | None = None):
+    if agent is None:
+        raise HTTPException(status_code=503, detail="Agent not loaded")
+    try:
+        return jobs.submit(kind, params, run, dedup_key)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
 @app.post("/agent/query", response_model=QueryResponse)
 async def query_agent_post(request: QueryRequest):
-    try:
-        asyncio.create_task(run_query(request.query))
-        return QueryResponse(response="Executing query...")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
+    job = submit_job("query", {"query": request.query}, lambda: run_query(request.query))
+    return QueryResponse(response="Executing query...", job_id=job.id)
+
+@app.post("/agent/query/stream")
+async def query_agent_stream(request: QueryRequest):
+    """
+    Run a query and stream its progress as Server-Sent Events: "job" (job ID), "token"
+    (generated text), "tool_start" / "tool_end" (tool calls), then "answer" or "error".
+    """
+    events = AgentEventStream()
+    job = submit_job("query", {"query": request.query, "stream": True}, lambda: run_query(request.query, events))
+
+    async def stream():
+        yield format_sse("job", {"job_id": job.id, "status": job.status})
+        try:
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(events.next(), timeout=STREAM_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    if job.status in FINISHED:
+                        yield format_sse("error", {"detail": f"Job {job.status}"})
+                        break
+                    continue
+                yield format_sse(event, data)
+                if event in ("answer", "error"):
+                    break
+        finally:
+            # Client disconnected: stop the run
+            jobs.cancel(job.id)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Job-Id": job.id}
+    )
 
 @app.post("/agent/restock", response_model=QueryResponse)
-async def restock_agent_post():
-    try:
-        restock_query = "Based of the daily sales, determine the products that will run out of stock in the next 7 days. After identifying them, place orders to restock each products with its sufficient amount to last a least one week. If no products need restocking, simply respond with [DONE]."
-        asyncio.create_task(run_query(restock_query))
-        return QueryResponse(response="Executing restock query...")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
+async def restock_agent_post(mode: RestockMode = RESTOCK_MODE):
+    """
+    Routine restock: "planner" (deterministic, no LLM) or "llm" (agent reasoning), to compare both.
+    A restock of the same mode still waiting in the queue is reused instead of queuing another.
+    """
+    job = submit_job("restock", {"mode": mode}, lambda: run_restock(mode), dedup_key=f"restock:{mode}")
+    return QueryResponse(response=f"Executing restock ({mode})...", job_id=job.id)
 
 @app.post("/agent/simulation", response_model=QueryResponse)
 async def simulation_agent_post(iterations: int = 5):
-    try:
-        from simulation import run_simulation
-        asyncio.create_task(run_simulation(agent, iterations))
-        return QueryResponse(response=f"Executing simulation for {iterations} iterations...")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Simulation error: {str(e)}")
+    from simulation import run_simulation
+    job = submit_job("simulation", {"iterations": iterations}, lambda: run_simulation(agent, iterations))
+    return QueryResponse(response=f"Executing simulation for {iterations} iterations...", job_id=job.id)
+
+@app.get("/agent/jobs")
+async def list_jobs():
+    """Queue metrics (queue depth, running jobs) and the known jobs."""
+    return {"metrics": jobs.metrics(), "jobs": [job.to_dict() for job in jobs.list()]}
+
+@app.get("/agent/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.delete("/agent/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "agent_loaded": agent is not None}
+    return {"status": "healthy", "agent_loaded": agent is not None, "jobs": jobs.metrics()}
+
+async def run_query(user_query: str, events: AgentEventStream | None = None) -> str:
+    print("\n" + "="*60)
+    try:
+        response = await agent.run_with_tools(user_query, events=events)
+    except Exception as e:
+        if events:
+            events.emit("error", detail=str(e))
+        raise
+    print(f"\n[Final Answer] {response}")
+    print("="*60)
+    if events:
+        events.emit("answer", response=response)
+    return response
 
-async def run_query(user_query: str):
+async def run_restock(mode: RestockMode):
     print("\n" + "="*60)
-    response = await agent.run_with_tools(user_query)
+    response = await agent.restock(mode=mode)
     print(f"\n[Final Answer] {response}")
     print("="*60)
+    return response
 
 if __name__ == "__main__":
     import uvicorn
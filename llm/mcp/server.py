@@ -1,108 +1,491 @@
 import asyncio
+import functools
+import importlib.util
+import inspect
+import json
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from mcp.server.fastmcp import FastMCP
+from mcp.types import CallToolResult, TextContent, ToolAnnotations
 from datetime import datetime, timedelta, timezone
 from http import HTTPStatus
-from httpx import AsyncClient
+from httpx import AsyncClient, ConnectError, Limits, Response, Timeout, TransportError
 from typing import List, Dict
+from pydantic import BaseModel
 import os
 
 FASTAPI_BASE_URL = os.getenv("FASTAPI_URL", "http://back:8000/api")
 
-mcp = FastMCP("retail-agent-mcp")
+# Shared HTTP client settings
+HTTP_MAX_CONNECTIONS = int(os.getenv("MCP_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("MCP_HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_TIMEOUT = float(os.getenv("MCP_HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("MCP_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP2 = os.getenv("MCP_HTTP2", "false").lower() == "true"
+HTTP_RETRIES = int(os.getenv("MCP_HTTP_RETRIES", "3"))
+HTTP_RETRY_BACKOFF = float(os.getenv("MCP_HTTP_RETRY_BACKOFF", "0.2"))
+RETRYABLE_STATUS_CODES = {HTTPStatus.BAD_GATEWAY, HTTPStatus.SERVICE_UNAVAILABLE, HTTPStatus.GATEWAY_TIMEOUT}
+IDEMPOTENT_METHODS = {"GET", "PUT", "DELETE"}
+
+# Result cache of the read-only tools. Only writes made through the MCP tools (@invalidates_cache)
+# clear it: orders or sales posted straight to the backend are served stale for up to the tool TTL
+# (@read_tool(ttl=...), 15s to 300s). Disable the cache when other clients write.
+CACHE_ENABLED = os.getenv("MCP_CACHE_ENABLED", "true").lower() == "true"
+CACHE_MAX_ENTRIES = int(os.getenv("MCP_CACHE_MAX_ENTRIES", "256"))
+
+# Output of the list tools: "table" (paginated TSV, compact for the LLM context) or "json"
+DEFAULT_OUTPUT = os.getenv("MCP_DEFAULT_OUTPUT", "table")
+TABLE_PAGE_SIZE = int(os.getenv("MCP_TABLE_PAGE_SIZE", "50"))
+CHARS_PER_TOKEN = 4
+OUTPUT_DOC = """
+
+    Output: output="table" returns a TSV page (header + rows) with next_page when more rows exist,
+    call again with page=N to get them. output="json" returns the full list of objects.
+"""
+
+# Server transport: "stdio" (subprocess per client) or "streamable-http" / "sse" (long-lived service)
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio")
+MCP_HOST = os.getenv("MCP_HOST", "0.0.0.0")
+MCP_PORT = int(os.getenv("MCP_PORT", "8001"))
+
+# Data access of the read-only tools: "http" (FastAPI backend) or "mongo" (direct MongoDB reads,
+# with the query definitions of the backend in back/db/queries.py). Writes always go through the backend.
+DATA_BACKEND = os.getenv("MCP_DATA_BACKEND", "http")
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/retail_db")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MCP_MONGO_MAX_POOL_SIZE", "20"))
+DEFAULT_STORE_ID = os.getenv("DEFAULT_STORE_ID", "STORE-001")
+BACKEND_QUERIES_PATH = os.getenv(
+    "BACKEND_QUERIES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "back", "db", "queries.py")
+)
+
+http_client: AsyncClient | None = None
+mongo_client = None
+active_sessions = 0
+
+
+def load_backend_queries():
+    """Import the query definitions of the backend (back/db/queries.py, standard library only)."""
+    spec = importlib.util.spec_from_file_location("backend_queries", BACKEND_QUERIES_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+queries = load_backend_queries() if DATA_BACKEND == "mongo" else None
+
+
+def get_http_client() -> AsyncClient:
+    """Return the keep-alive client shared by all tools, creating it on first use."""
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http2 = HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("[MCP] MCP_HTTP2 requires the 'h2' package (httpx[http2]), using HTTP/1.1")
+                http2 = False
+        http_client = AsyncClient(
+            base_url=FASTAPI_BASE_URL,
+            http2=http2,
+            limits=Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            timeout=Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        )
+    return http_client
+
+
+async def backend_request(method: str, path: str, **kwargs) -> Response:
+    """
+    Send a request to the FastAPI backend through the shared client.
 
+    Transport errors and 502/503/504 responses are retried with exponential backoff.
+    Non-idempotent requests (POST) are only retried when the connection could not be opened.
+    """
+    client = get_http_client()
+    for attempt in range(HTTP_RETRIES + 1):
+        last_attempt = attempt == HTTP_RETRIES
+        try:
+            response = await client.request(method, path, **kwargs)
+        except TransportError as e:
+            retryable = method in IDEMPOTENT_METHODS or isinstance(e, ConnectError)
+            if last_attempt or not retryable:
+                raise
+        else:
+            if last_attempt or method not in IDEMPOTENT_METHODS or response.status_code not in RETRYABLE_STATUS_CODES:
+                return response
+            retry_after = response.headers.get("retry-after")
+            if retry_after and retry_after.isdigit():
+                await asyncio.sleep(int(retry_after))
+                continue
+        await asyncio.sleep(HTTP_RETRY_BACKOFF * 2 ** attempt)
+
+
+def get_mongo_database():
+    """Return the database of MONGO_URL through a pooled Motor client, created on first use."""
+    global mongo_client
+    if mongo_client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        mongo_client = AsyncIOMotorClient(MONGO_URL, maxPoolSize=MONGO_MAX_POOL_SIZE)
+    return mongo_client.get_default_database()
+
+
+def to_json_document(document: Dict) -> Dict:
+    """Shape a MongoDB document like the backend JSON responses (no _id, ISO dates)."""
+    document.pop("_id", None)
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in document.items()}
+
+
+async def mongo_find(collection: str, query: Dict, limit: int, skip: int = 0, sort: List | None = None) -> List[Dict]:
+    cursor = get_mongo_database()[collection].find(query, skip=skip, limit=limit, sort=sort)
+    return [to_json_document(document) async for document in cursor]
+
+
+async def mongo_aggregate(collection: str, pipeline: List[Dict]) -> List[Dict]:
+    return [document async for document in get_mongo_database()[collection].aggregate(pipeline)]
+
+
+async def mongo_stock_snapshot(store_id: str, days: int = 7, skus: List[str] | None = None) -> List[Dict]:
+    """Same sums as the backend /stocks/snapshot endpoint, computed by MongoDB."""
+    since = datetime.now() - timedelta(days=days)
+    stocks, pending, sold = await asyncio.gather(
+        mongo_find(queries.STOCK_LEVELS, queries.stock_filter(store_id, skus=skus), 0),
+        mongo_aggregate(queries.PRODUCT_ORDERS, queries.pending_quantity_by_sku_pipeline(store_id, skus)),
+        mongo_aggregate(queries.SALES_TRANSACTIONS, queries.sold_quantity_by_sku_pipeline(store_id, since, skus)),
+    )
+    return queries.stock_snapshot(stocks, pending, sold)
+
+
+async def read_mongo(path: str, params: Dict) -> List[Dict]:
+    """Run the query of a backend list endpoint straight on MongoDB."""
+    params = dict(params)
+    limit = params.pop("limit", 100)
+    store_id = params.pop("store_id", DEFAULT_STORE_ID)
+    if path == "/products":
+        return await mongo_find(queries.PRODUCTS, queries.products_filter(**params), limit)
+    if path == "/sales":
+        return await mongo_find(queries.SALES_TRANSACTIONS, queries.sales_filter(store_id, **params), limit)
+    if path == "/stocks":
+        return await mongo_find(queries.STOCK_LEVELS, queries.stock_filter(store_id, **params), limit)
+    if path == "/orders":
+        return await mongo_find(queries.PRODUCT_ORDERS, queries.orders_filter(store_id, **params), limit)
+    if path == "/stocks/snapshot":
+        return await mongo_stock_snapshot(store_id, **params)
+    if path == "/reorder/at-risk":
+        return await mongo_find(queries.REORDER_STATE, queries.at_risk_filter(store_id), limit, sort=queries.AT_RISK_SORT)
+    raise ValueError(f"No direct MongoDB query for {path}")
+
+
+async def read_backend(path: str, params: Dict):
+    """
+    Read a backend list endpoint: GET through the backend in "http" mode, or the
+    same query on MongoDB in "mongo" mode. Returns (data, error).
+    """
+    if DATA_BACKEND == "mongo":
+        return await read_mongo(path, params), None
+    response = await backend_request("GET", path, params=params)
+    if response.status_code != HTTPStatus.OK:
+        return None, f"{response.status_code}: {response.text}"
+    return response.json(), None
+
+
+class ToolResultCache:
+    """LRU cache of tool results with a TTL per entry and hit/miss counters per tool."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() > expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def record(self, tool_name: str, hit: bool):
+        counters = self.hits if hit else self.misses
+        counters[tool_name] = counters.get(tool_name, 0) + 1
+
+    def stats(self, tool_name: str) -> dict:
+        hits = self.hits.get(tool_name, 0)
+        total = hits + self.misses.get(tool_name, 0)
+        return {"hits": hits, "requests": total, "hit_rate": round(hits / total, 3) if total else 0.0}
+
+
+tool_cache = ToolResultCache(CACHE_MAX_ENTRIES)
+
+
+def tool_result(result, meta: dict) -> CallToolResult:
+    """Build the tool result the same way FastMCP does (one text item per list element), with metadata."""
+    items = result if isinstance(result, list) else [result]
+    return CallToolResult(
+        content=[TextContent(type="text", text=json.dumps(item, indent=2, default=str)) for item in items],
+        _meta=meta,
+    )
+
+
+def format_cell(value) -> str:
+    """Render a table cell: numbers rounded, no tabs or newlines inside text."""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+def format_table(rows: List[Dict], page: int) -> Dict:
+    """
+    One page of rows as TSV (header + one line per row), with the pagination
+    state and a token estimate so the agent can decide to fetch the next page.
+    """
+    columns = list(rows[0].keys()) if rows else []
+    pages = max(1, -(-len(rows) // TABLE_PAGE_SIZE))
+    page = min(max(page, 1), pages)
+    page_rows = rows[(page - 1) * TABLE_PAGE_SIZE:page * TABLE_PAGE_SIZE]
+
+    lines = ["\t".join(columns)]
+    lines += ["\t".join(format_cell(row.get(column)) for column in columns) for row in page_rows]
+    table = "\n".join(lines)
+
+    return {
+        "table": table,
+        "page": page,
+        "pages": pages,
+        "total_rows": len(rows),
+        "next_page": page + 1 if page < pages else None,
+        "token_estimate": len(table) // CHARS_PER_TOKEN + 1,
+    }
+
+
+def read_tool(ttl: float):
+    """
+    Decorator for read-only tools returning lists.
 
-@mcp.tool()
-async def soon_out_of_stock_products(days: int = 5):
+    Results are cached for `ttl` seconds, keyed on the tool name and its normalized
+    arguments (errors are never cached). Writes made outside the MCP tools do not clear
+    the cache, so `ttl` is the longest a result can lag behind the backend. The tool also gets `output` ("table": paginated
+    TSV, or "json": list of objects) and `page` arguments; cache and pagination
+    details are returned in the result metadata.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, output: str = DEFAULT_OUTPUT, page: int = 1, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = json.dumps([func.__name__, bound.arguments], sort_keys=True, default=str)
+
+            result = tool_cache.get(key) if CACHE_ENABLED else None
+            hit = result is not None
+            if not hit:
+                result = await func(*args, **kwargs)
+                if CACHE_ENABLED and not (isinstance(result, dict) and "error" in result):
+                    tool_cache.set(key, result, ttl)
+            tool_cache.record(func.__name__, hit)
+            meta = {"cache": {"hit": hit, "ttl": ttl, **tool_cache.stats(func.__name__)}}
+
+            if output == "table" and isinstance(result, list):
+                table = format_table(result, page)
+                meta["page"] = {name: table[name] for name in ("page", "pages", "total_rows", "next_page", "token_estimate")}
+                return tool_result(table, meta)
+            return tool_result(result, meta)
+
+        wrapper.__signature__ = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter("output", inspect.Parameter.POSITIONAL_OR_KEYWORD, default=DEFAULT_OUTPUT, annotation=str),
+            inspect.Parameter("page", inspect.Parameter.POSITIONAL_OR_KEYWORD, default=1, annotation=int),
+        ])
+        wrapper.__doc__ = (func.__doc__ or "").rstrip() + OUTPUT_DOC
+        return wrapper
+
+    return decorator
+
+
+def invalidates_cache(func):
+    """Clear the tool result cache after a successful write."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        result = await func(*args, **kwargs)
+        if not (isinstance(result, dict) and "error" in result):
+            tool_cache.clear()
+        return result
+
+    return wrapper
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    """
+    Open the shared HTTP (and MongoDB) clients with the first session and close them
+    with the last one (over HTTP transports the lifespan runs once per client session).
     """
-    Get a list of products that are soon out of stock based on current stock and recent sales trends.
+    global active_sessions, mongo_client
+    get_http_client()
+    if DATA_BACKEND == "mongo":
+        get_mongo_database()
+    active_sessions += 1
+    try:
+        yield {}
+    finally:
+        active_sessions -= 1
+        if active_sessions == 0:
+            if http_client is not None:
+                await http_client.aclose()
+            if mongo_client is not None:
+                mongo_client.close()
+                mongo_client = None
+
+
+mcp = FastMCP("retail-agent-mcp", lifespan=lifespan, host=MCP_HOST, port=MCP_PORT)
+
+# Tool annotations: clients may run read-only tools concurrently, mutating ones keep their order
+READ_ONLY = ToolAnnotations(readOnlyHint=True)
+MUTATING = ToolAnnotations(readOnlyHint=False, destructiveHint=False)
+
+
+@mcp.tool(annotations=READ_ONLY)
+@read_tool(ttl=30)
+async def soon_out_of_stock_products(days: int = 5, store_id: str | None = None):
+    """
+    Get a list of products that are soon out of stock based on current stock and forecast demand.
 
     Args:
         days (int): The number of days to look ahead for stock depletion.
+        store_id (str, optional): Store to analyze. Defaults to the main store.
 
     Returns:
-        List of products with their SKUs, current stock, average daily sales, estimated days until out of stock, and recommended order quantity for 2 weeks of stock.
+        List of products with their SKUs, current stock, forecast average daily sales, estimated days until out of stock, and recommended order quantity for 2 weeks of stock.
     """
     try:
-        async with AsyncClient() as client:
+        params = {"days": days}
+        if store_id:
+            params["store_id"] = store_id
+
+        # Demand forecast and restock policy are computed by the backend (in both data modes)
+        response = await backend_request("GET", "/forecast/restock", params=params)
+        if response.status_code != HTTPStatus.OK:
+            error_msg = f"Error getting restock recommendations: {response.status_code}: {response.text}"
+            return {"error": error_msg}
 
-            # Get current stock levels
-            stock_response = await client.get(f"{FASTAPI_BASE_URL}/stocks/virtual/all")
-            if stock_response.status_code != HTTPStatus.OK:
-                error_msg = f"Error getting stock levels: {stock_response.status_code}: {stock_response.text}"
-                return {"error": error_msg}
+        return response.json()
 
-            # Get sales data for the past 'days' period to calculate average
-            sales_response = await client.get(f"{FASTAPI_BASE_URL}/sales", params={"days": days})
-            if sales_response.status_code != HTTPStatus.OK:
-                error_msg = f"Error getting sales data: {sales_response.status_code}: {sales_response.text}"
-                return {"error": error_msg}
+    except Exception as e:
+        error_msg = str(e)
+        return {"error": error_msg}
+
+
+@mcp.tool(annotations=READ_ONLY)
+@read_tool(ttl=15)
+async def inventory_snapshot(skus: List[str] | None = None, days: int = 7, store_id: str | None = None):
+    """
+    Get stock, pending orders, virtual stock and sales velocity per product in one call.
+
+    Args:
+        skus (list, optional): Products to include, e.g. ["SKU-0001", "SKU-0007"]. Defaults to all products of the store.
+        days (int): Number of past days used to compute the sales velocity. Default is 7.
+        store_id (str, optional): Store to query. Defaults to the main store.
+
+    Returns:
+        List of products with SKU, stock on hand, pending order quantity, virtual stock (stock + pending orders),
+        average daily sales and days of cover (virtual stock / daily sales).
+    """
+    try:
+        if days <= 0:
+            error_msg = "Days must be positive"
+            return {"error": error_msg}
+
+        # Per-SKU sums computed by MongoDB (no row cap on sales or orders)
+        params = {"days": days}
+        if skus:
+            params["skus"] = skus
+        if store_id:
+            params["store_id"] = store_id
+        stocks, error = await read_backend("/stocks/snapshot", params)
+        if error:
+            error_msg = f"Error getting inventory snapshot: {error}"
+            return {"error": error_msg}
+
+        result = []
+        for stock in stocks:
+            virtual_stock = stock["stock_on_hand"] + stock["pending_quantity"]
+            daily_velocity = stock["sold_quantity"] / days
+            result.append({
+                "sku": stock["sku"],
+                "stock_on_hand": stock["stock_on_hand"],
+                "pending_quantity": stock["pending_quantity"],
+                "virtual_stock": virtual_stock,
+                "daily_velocity": round(daily_velocity, 2),
+                "days_of_cover": round(virtual_stock / daily_velocity, 1) if daily_velocity else None
+            })
+
+        return result
+    except Exception as e:
+        error_msg = str(e)
+        return {"error": error_msg}
+
+
+@mcp.tool(annotations=READ_ONLY)
+@read_tool(ttl=15)
+async def get_reorder_alerts(limit: int = 100, store_id: str | None = None):
+    """
+    Get the products at or below their reorder point (stock + pending orders will not last until a new order is delivered).
+    Cheap to call: the reorder state is kept up to date by the backend on every sale, stock or order change.
+
+    Args:
+        limit (int): Maximum number of products to return. Default is 100.
+        store_id (str, optional): Store to query. Defaults to the main store.
+
+    Returns:
+        List of products, most urgent first, with SKU, virtual stock, daily sales, supplier lead time, reorder point and days of cover.
+    """
+    try:
+        params = {"limit": limit}
+        if store_id:
+            params["store_id"] = store_id
 
-            stocks = stock_response.json()
-            sales = sales_response.json()
-
-            # Calculate average daily sales per SKU
-            sales_aggregation: Dict[str, int] = {}
-            for sale in sales:
-                sku = sale["sku"]
-                quantity = sale["quantity"]
-                sales_aggregation[sku] = sales_aggregation.get(sku, 0) + quantity
-
-            # Determine products that will run out in the given days
-            result = []
-            LOW_STOCK_THRESHOLD = 50  # Products with stock below this are considered critically low
-            DEFAULT_ORDER_QUANTITY = 200
-
-            for stock in stocks:
-                sku = stock["sku"]
-                current_stock = stock.get("virtual_stock", stock["stock_on_hand"])
-                total_sales = sales_aggregation.get(sku, 0)
-
-                # Calculate average daily sales (total sales / number of days analyzed)
-                average_daily_sales = total_sales / days if days > 0 else 0
-
-                # Check if stock is critically low (regardless of sales data)
-                if current_stock <= LOW_STOCK_THRESHOLD:
-                    # Stock is critically low - needs restocking
-                    if average_daily_sales > 0:
-                        # We have sales data - use it to calculate proper amount
-                        recommended_quantity = int(average_daily_sales * days * 4)  # 4 times the period
-                        recommended_quantity = max(recommended_quantity, DEFAULT_ORDER_QUANTITY)
-                    else:
-                        # No sales data but stock is low - order default amount
-                        recommended_quantity = DEFAULT_ORDER_QUANTITY
-
-                    result.append({
-                        "sku": sku,
-                        "current_stock": current_stock,
-                        "average_daily_sales": round(average_daily_sales, 2),
-                        "days_until_out_of_stock": 0 if average_daily_sales == 0 else round(current_stock / average_daily_sales, 2),
-                        "recommended_order_quantity": recommended_quantity
-                    })
-                    continue
-
-                # For products above threshold, check if they'll run out based on sales
-                if average_daily_sales > 0:
-                    days_until_out = current_stock / average_daily_sales
-                    # If they will run out within the specified days in 4 times the period
-                    if days_until_out <= days*4:
-                        target_stock = average_daily_sales * days * 4
-
-                        result.append({
-                            "sku": sku,
-                            "current_stock": current_stock,
-                            "average_daily_sales": round(average_daily_sales, 2),
-                            "days_until_out_of_stock": round(days_until_out, 2),
-                            "recommended_order_quantity": int(target_stock)
-                        })
-
-            return sorted(result, key=lambda x: x["days_until_out_of_stock"])
+        data, error = await read_backend("/reorder/at-risk", params)
+        if error:
+            error_msg = f"Error getting reorder alerts: {error}"
+            return {"error": error_msg}
 
+        result = [{
+            "sku": item["sku"],
+            "virtual_stock": item["virtual_stock"],
+            "daily_velocity": item["daily_velocity"],
+            "lead_time_days": item["lead_time_days"],
+            "reorder_point": item["reorder_point"],
+            "days_of_cover": item["days_of_cover"]
+        } for item in data]
+
+        return result
     except Exception as e:
         error_msg = str(e)
         return {"error": error_msg}
 
 
-@mcp.tool()
+@mcp.tool(annotations=READ_ONLY)
+@read_tool(ttl=300)
 async def get_products(category: str | None = None, name: str | None = None, limit: int = 50):
     """
     Get a list of products with optional filters.
@@ -116,34 +499,33 @@ async def get_products(category: str | None = None, name: str | None = None, lim
         List of products with their SKUs, names, categories, and prices.
     """
     try:
-        async with AsyncClient() as client:
-            params = {"limit": limit}
-            if category:
-                params["category"] = category
-            if name:
-                params["name"] = name
-
-            response = await client.get(f"{FASTAPI_BASE_URL}/products", params=params)
-            if response.status_code != HTTPStatus.OK:
-                error_msg = f"Error getting products: {response.status_code}: {response.text}"
-                return {"error": error_msg}
+        params = {"limit": limit}
+        if category:
+            params["category"] = category
+        if name:
+            params["name"] = name
+
+        data, error = await read_backend("/products", params)
+        if error:
+            error_msg = f"Error getting products: {error}"
+            return {"error": error_msg}
 
-            data = response.json()
-            result = [{
-                "sku": item["sku"],
-                "name": item["name"],
-                "category": item["category"],
-                "price": item["price"]
-            } for item in data]
+        result = [{
+            "sku": item["sku"],
+            "name": item["name"],
+            "category": item["category"],
+            "price": item["price"]
+        } for item in data]
 
-            return result
+        return result
     except Exception as e:
         error_msg = str(e)
         return {"error": error_msg}
 
 
-@mcp.tool()
-async def get_sales(sku: str | None = None, days: int | None = None, limit: int = 100):
+@mcp.tool(annotations=READ_ONLY)
+@read_tool(ttl=30)
+async def get_sales(sku: str | None = None, days: int | None = None, limit: int = 100, store_id: str | None = None):
     """
     Get sales transactions with optional filters.
 
@@ -151,39 +533,41 @@ async def get_sales(sku: str | None = None, days: int | None = None, limit: int
         sku (str, optional): Filter by product SKU.
         days (int, optional): Get sales from the last N days.
         limit (int): Maximum number of transactions to return. Default is 100.
+        store_id (str, optional): Store to query. Defaults to the main store.
 
     Returns:
         List of sales transactions with SKU, quantity, and timestamp.
     """
     try:
-        async with AsyncClient() as client:
-            params = {"limit": limit}
-            if sku:
-                params["sku"] = sku
-            if days is not None:
-                params["days"] = days
-
-            response = await client.get(f"{FASTAPI_BASE_URL}/sales", params=params)
-            if response.status_code != HTTPStatus.OK:
-                error_msg = f"Error getting sales: {response.status_code}: {response.text}"
-                return {"error": error_msg}
+        params = {"limit": limit}
+        if sku:
+            params["sku"] = sku
+        if days is not None:
+            params["days"] = days
+        if store_id:
+            params["store_id"] = store_id
+
+        data, error = await read_backend("/sales", params)
+        if error:
+            error_msg = f"Error getting sales: {error}"
+            return {"error": error_msg}
 
-            data = response.json()
-            result = [{
-                "transaction_id": item["transaction_id"],
-                "sku": item["sku"],
-                "quantity": item["quantity"],
-                "timestamp": item["timestamp"]
-            } for item in data]
+        result = [{
+            "transaction_id": item["transaction_id"],
+            "sku": item["sku"],
+            "quantity": item["quantity"],
+            "timestamp": item["timestamp"]
+        } for item in data]
 
-            return result
+        return result
     except Exception as e:
         error_msg = str(e)
         return {"error": error_msg}
 
 
-@mcp.tool()
-async def get_stock_levels(sku: str | None = None, min_stock: int | None = None, max_stock: int | None = None, limit: int = 100):
+@mcp.tool(annotations=READ_ONLY)
+@read_tool(ttl=15)
+async def get_stock_levels(sku: str | None = None, min_stock: int | None = None, max_stock: int | None = None, limit: int = 100, store_id: str | None = None):
     """
     Get stock levels with optional filters.
 
@@ -192,45 +576,48 @@ async def get_stock_levels(sku: str | None = None, min_stock: int | None = None,
         min_stock (int, optional): Filter products with stock >= this value.
         max_stock (int, optional): Filter products with stock <= this value.
         limit (int): Maximum number of items to return. Default is 100.
+        store_id (str, optional): Store to query. Defaults to the main store.
 
     Returns:
         List of stock levels with SKU and stock on hand.
     """
     try:
-        async with AsyncClient() as client:
-            params = {"limit": limit}
-            if sku:
-                params["sku"] = sku
-            if min_stock is not None:
-                params["min_stock"] = min_stock
-            if max_stock is not None:
-                params["max_stock"] = max_stock
-
-            response = await client.get(f"{FASTAPI_BASE_URL}/stocks", params=params)
-            if response.status_code != HTTPStatus.OK:
-                error_msg = f"Error getting stock levels: {response.status_code}: {response.text}"
-                return {"error": error_msg}
+        params = {"limit": limit}
+        if sku:
+            params["sku"] = sku
+        if min_stock is not None:
+            params["min_stock"] = min_stock
+        if max_stock is not None:
+            params["max_stock"] = max_stock
+        if store_id:
+            params["store_id"] = store_id
+
+        data, error = await read_backend("/stocks", params)
+        if error:
+            error_msg = f"Error getting stock levels: {error}"
+            return {"error": error_msg}
 
-            data = response.json()
-            result = [{
-                "sku": item["sku"],
-                "stock_on_hand": item["stock_on_hand"]
-            } for item in data]
+        result = [{
+            "sku": item["sku"],
+            "stock_on_hand": item["stock_on_hand"]
+        } for item in data]
 
-            return result
+        return result
     except Exception as e:
         error_msg = str(e)
         return {"error": error_msg}
 
 
-@mcp.tool()
-async def order_product(sku: str, quantity: int):
+@mcp.tool(annotations=MUTATING)
+@invalidates_cache
+async def order_product(sku: str, quantity: int, store_id: str | None = None):
     """
     Place an order for a product to replenish stock.
 
     Args:
         sku (str): The SKU of the product to order.
         quantity (int): The quantity to order.
+        store_id (str, optional): Store to restock. Defaults to the main store.
     Returns:
         Confirmation message or error.
     """
@@ -243,56 +630,103 @@ async def order_product(sku: str, quantity: int):
             error_msg = "Quantity must be positive"
             return {"error": error_msg}
 
-        async with AsyncClient() as client:
-            order_data = {
-                "sku": sku.strip(),
-                "quantity": quantity,
-                "order_date": datetime.now(timezone.utc).isoformat()
-            }
-            response = await client.post(f"{FASTAPI_BASE_URL}/orders", json=order_data)
-            if response.status_code != HTTPStatus.CREATED:
-                error_msg = f"Erreur {response.status_code}: {response.text}"
+        order_data = {
+            "sku": sku.strip(),
+            "quantity": quantity,
+            "order_date": datetime.now(timezone.utc).isoformat()
+        }
+        if store_id:
+            order_data["store_id"] = store_id
+        response = await backend_request("POST", "/orders", json=order_data)
+        if response.status_code != HTTPStatus.CREATED:
+            error_msg = f"Erreur {response.status_code}: {response.text}"
+            return {"error": error_msg}
+
+        return {"message": f"Order placed for SKU {sku}, quantity {quantity}."}
+    except Exception as e:
+        error_msg = str(e)
+        return {"error": error_msg}
+
+
+class OrderItem(BaseModel):
+    sku: str
+    quantity: int
+
+
+@mcp.tool(annotations=MUTATING)
+@invalidates_cache
+async def order_products(items: List[OrderItem], store_id: str | None = None):
+    """
+    Place orders for several products at once (preferred over many order_product calls).
+
+    Args:
+        items (list): Products to order, e.g. [{"sku": "SKU-0001", "quantity": 120}, {"sku": "SKU-0007", "quantity": 80}].
+        store_id (str, optional): Store to restock. Defaults to the main store.
+    Returns:
+        Confirmation message or error. No order is placed if any item is invalid.
+    """
+    try:
+        if not items:
+            error_msg = "At least one item is required"
+            return {"error": error_msg}
+
+        for item in items:
+            if not item.sku or not item.sku.strip():
+                error_msg = "SKU cannot be empty"
+                return {"error": error_msg}
+            if item.quantity <= 0:
+                error_msg = f"Quantity must be positive (SKU {item.sku})"
                 return {"error": error_msg}
 
-            return {"message": f"Order placed for SKU {sku}, quantity {quantity}."}
+        params = {"store_id": store_id} if store_id else {}
+        order_data = {"items": [{"sku": item.sku.strip(), "quantity": item.quantity} for item in items]}
+        response = await backend_request("POST", "/orders/bulk", json=order_data, params=params)
+        if response.status_code != HTTPStatus.CREATED:
+            error_msg = f"Erreur {response.status_code}: {response.text}"
+            return {"error": error_msg}
+
+        return {"message": f"{len(items)} orders placed: " + ", ".join(f"{item.sku} x{item.quantity}" for item in items)}
     except Exception as e:
         error_msg = str(e)
         return {"error": error_msg}
 
 
-@mcp.tool()
-async def get_orders_by_status(status: str = "pending", days: int | None = None):
+@mcp.tool(annotations=READ_ONLY)
+@read_tool(ttl=15)
+async def get_orders_by_status(status: str = "pending", days: int | None = None, store_id: str | None = None):
     """
     Get a list of product orders by status, optionally filtered by age.
 
     Args:
         status (str): The status of orders to retrieve. Default is "pending".
         days (int, optional): If provided, only return orders from the last N days.
+        store_id (str, optional): Store to query. Defaults to the main store.
 
     Returns:
         List of orders with their SKUs, quantities, order dates, and order IDs.
     """
     try:
-        async with AsyncClient() as client:
-            params = {"status": status}
-            if days is not None:
-                params["days"] = days
-
-            response = await client.get(f"{FASTAPI_BASE_URL}/orders", params=params)
-            if response.status_code != HTTPStatus.OK:
-                error_msg = f"Erreur {response.status_code}: {response.text}"
-                return {"error": error_msg}
+        params = {"status": status}
+        if days is not None:
+            params["days"] = days
+        if store_id:
+            params["store_id"] = store_id
+
+        data, error = await read_backend("/orders", params)
+        if error:
+            error_msg = f"Erreur {error}"
+            return {"error": error_msg}
 
-            data = response.json()
-            result = [{"order_id": item["order_id"], "sku": item["sku"], "quantity": item["quantity"], "order_date": item["order_date"]} for item in data]
+        result = [{"order_id": item["order_id"], "sku": item["sku"], "quantity": item["quantity"], "order_date": item["order_date"]} for item in data]
 
-            return result
+        return result
     except Exception as e:
         error_msg = str(e)
         return {"error": error_msg}
 
 
-@mcp.tool()
+@mcp.tool(annotations=MUTATING)
+@invalidates_cache
 async def update_order_status(order_id: str, status: str):
     """
     Update the status of a product order.
@@ -314,25 +748,19 @@ async def update_order_status(order_id: str, status: str):
             error_msg = "Invalid status value"
             return {"error": error_msg}
 
-        async with AsyncClient() as client:
-            update_data = {
-                "status": status
-            }
-            response = await client.put(f"{FASTAPI_BASE_URL}/orders/{order_id.strip()}", json=update_data)
-            if response.status_code != HTTPStatus.OK:
-                error_msg = f"Erreur {response.status_code}: {response.text}"
-                return {"error": error_msg}
+        update_data = {
+            "status": status
+        }
+        response = await backend_request("PUT", f"/orders/{order_id.strip()}", json=update_data)
+        if response.status_code != HTTPStatus.OK:
+            error_msg = f"Erreur {response.status_code}: {response.text}"
+            return {"error": error_msg}
 
-            return {"message": f"Order {order_id} updated to status {status}."}
+        return {"message": f"Order {order_id} updated to status {status}."}
     except Exception as e:
         error_msg = str(e)
         return {"error": error_msg}
 
 
-
 if __name__ == "__main__":
-    mcp.run()
-
-
-
-
+    mcp.run(transport=MCP_TRANSPORT)
@@ -174,9 +174,9 @@ async def run_simulation(agent: RetailInventoryAgent, iterations: int):
 
             # Step 3: Run restock agent to check stock and place orders
             print(f"\n[SIMULATION] Step 3: Running restock agent...")
-            restock_query = "Based of the daily sales, determine the products that will run out of stock in the next 7 days. After identifying them, place orders to restock each products with its sufficient amount to last a least one week. If no products need restocking, simply respond with [DONE]."
             try:
-                response = await agent.run_with_tools(restock_query)
+                # RESTOCK_MODE: deterministic planner or LLM reasoning
+                response = await agent.restock()
                 print(f"[SIMULATION] Restock agent response: {response[:200]}...")
             except Exception as e:
                 print(f"[SIMULATION] Error running restock agent: {e}")
@@ -0,0 +1,35 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app_llm.agent import RetailInventoryAgent
+
+TOOLS = [
+    SimpleNamespace(name="soon_out_of_stock_products", description="Products running out of stock."),
+    SimpleNamespace(name="order_products", description="Order several products at once."),
+]
+
+
+def make_agent(tool_call_mode: str = "text") -> RetailInventoryAgent:
+    """Agent without a model or an MCP session, enough to build prompts."""
+    agent = RetailInventoryAgent.__new__(RetailInventoryAgent)
+    agent._tool_call_mode = tool_call_mode
+    return agent
+
+
+@pytest.mark.parametrize("tool_call_mode", ["text", "grammar", "native"])
+def test_system_prompt_lists_tools(tool_call_mode):
+    prompt = make_agent(tool_call_mode)._build_system_prompt(TOOLS)
+    assert "- order_products: Order several products at once." in prompt
+
+
+@pytest.mark.parametrize("tool_call_mode", ["text", "grammar"])
+def test_system_prompt_keeps_example_braces(tool_call_mode):
+    prompt = make_agent(tool_call_mode)._build_system_prompt(TOOLS)
+    assert '{"sku": "SKU-0018", "quantity": 166}' in prompt
+
+
+def test_restock_rejects_unknown_mode():
+    with pytest.raises(ValueError, match="Unknown restock mode"):
+        asyncio.run(make_agent().restock(mode="LLM"))
@@ -0,0 +1,19 @@
+import pytest
+
+from app_llm.backends import LLMBackend, ScriptedBackend
+
+
+def test_backend_without_generate_cannot_be_created():
+    class Incomplete(LLMBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_scripted_backend_replays_responses():
+    backend = ScriptedBackend(responses=["first", "second"])
+    tokens = []
+    assert backend.generate("prompt", 16, 0.0, on_token=tokens.append) == ("first", [])
+    assert tokens == ["first"]
+    assert backend.complete("prompt", 16, 0.0) == "second"
@@ -0,0 +1,8 @@
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_restock_rejects_unknown_mode():
+    response = TestClient(main.app).post("/agent/restock", params={"mode": "LLM"})
+    assert response.status_code == 422